@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时基准测试
+
+每次在新的解释器进程中导入，取多次运行的中位数，
+用于检查 `import tt` 以及只使用 Config / DB 的脚本的启动开销。
+以显式导入全部子模块（即未延迟导入时 `import tt` 的开销）为基准，列出各项节省的耗时。
+
+用法:
+    python bench_import.py [-n 次数]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+# 名称 -> 导入语句
+CASES = [
+    ('import tt', 'import tt'),
+    ('from tt import Config', 'from tt import Config'),
+    ('from tt import DB', 'from tt import DB'),
+    ('from tt import info', 'from tt import info'),
+    ('from tt import TGClient', 'from tt import TGClient'),
+]
+
+# 基准：显式导入 tt 的全部子模块
+EAGER = (
+    '导入全部子模块（基准）',
+    "import importlib, pkgutil, tt\n"
+    "for m in pkgutil.iter_modules(tt.__path__):\n"
+    "    importlib.import_module('tt.' + m.name)",
+)
+
+# 在子进程中测量导入耗时（秒），并输出导入后加载的第三方模块
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ('telethon', 'pymysql', 'yaml', 'socks', 'pytz') if m in sys.modules)
+print(elapsed, ','.join(heavy))
+"""
+
+
+def measure(statement, runs):
+    """
+    在新进程中多次执行导入语句
+
+    Returns:
+        tuple: (耗时中位数（毫秒）, 加载的第三方模块) ；导入失败时耗时为 None
+    """
+    times = []
+    heavy = ''
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(statement=statement)],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, heavy = result.stdout.split(' ', 1)
+        times.append(float(elapsed) * 1000)
+    return statistics.median(times), heavy.strip() or '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tt 导入耗时基准测试')
+    parser.add_argument('-n', type=int, default=10, help='每项运行次数')
+    args = parser.parse_args()
+
+    print(f"{'导入语句':<28}{'耗时(ms)':>10}{'节省(ms)':>10}  加载的第三方模块")
+    baseline, heavy = measure(EAGER[1], args.n)
+    shown = f"{baseline:>10.1f}" if baseline is not None else f"{'失败':>10}"
+    print(f"{EAGER[0]:<28}{shown}{'-':>10}  {heavy}")
+    for name, statement in CASES:
+        elapsed, heavy = measure(statement, args.n)
+        shown = f"{elapsed:>10.1f}" if elapsed is not None else f"{'失败':>10}"
+        saved = f"{baseline - elapsed:>10.1f}" if None not in (baseline, elapsed) else f"{'-':>10}"
+        print(f"{name:<28}{shown}{saved}  {heavy}")
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,7 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=requirements,
+    extras_require={"json": ["orjson>=3.6"], "zstd": ["zstandard>=0.15"]},
     keywords="telegram telethon automation",
 )
 
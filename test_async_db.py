@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+_call_db 线程池选择测试（不连接数据库）
+"""
+
+import asyncio
+import threading
+import time
+
+from tt.async_db import _call_db
+
+
+class DB:
+    """记录同时执行的调用数和执行线程"""
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._serial_executor = None
+        self.active = 0
+        self.peak = 0
+        self.threads = set()
+
+    def query(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        self.active -= 1
+        return 1
+
+
+def run_concurrently(db, count=8):
+    async def main():
+        return await asyncio.gather(*[_call_db(db, 'query') for _ in range(count)])
+    return asyncio.run(main())
+
+
+def test_single_connection_db_is_serialised():
+    """单连接的 DB 在同一个专用线程中依次执行"""
+    db = DB()
+    assert run_concurrently(db) == [1] * 8
+    assert db.peak == 1
+    assert len(db.threads) == 1
+
+
+def test_pooled_db_runs_in_parallel():
+    """启用连接池的 DB 并行执行"""
+    db = DB(pool=object())
+    run_concurrently(db)
+    assert db.peak > 1
+    assert db._serial_executor is None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bulk_insert / bulk_upsert 分块测试（不连接数据库，记录生成的语句）
+"""
+
+import contextlib
+
+import pytest
+
+from tt.db import DB
+
+
+class Connection:
+    """只实现转义的连接"""
+
+    @staticmethod
+    def escape(row):
+        return '(' + ','.join('NULL' if v is None else repr(v) for v in row) + ')'
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """记录执行的语句，每条语句影响的行数为其 VALUES 中的行数，自增 ID 从 100 开始"""
+    db = DB('test', 'pwd')
+    db.statements = []
+    next_id = [100]
+
+    def execute(sql, params, result, **kwargs):
+        db.statements.append(sql)
+        count = sql.count('),(') + 1
+        first_id = next_id[0]
+        next_id[0] += count
+        return count, first_id
+
+    monkeypatch.setattr(db, 'connection', lambda: contextlib.nullcontext(Connection()))
+    monkeypatch.setattr(db, '_max_packet', lambda: 64 * 1024 * 1024)
+    monkeypatch.setattr(db, '_execute', execute)
+    return db
+
+
+def test_chunk_by_rows(db):
+    """按 max_rows 分块，返回每块的自增 ID 范围"""
+    rows = ({'id': i, 'name': f'n{i}'} for i in range(25))
+    result = db.bulk_insert('users', rows, max_rows=10)
+    assert result.rowcount == 25
+    assert result.statements == 3
+    assert result.id_ranges == [(100, 109), (110, 119), (120, 124)]
+    assert db.statements[0].startswith("INSERT INTO `users` (`id`, `name`) VALUES (0,'n0'),(1,'n1')")
+    assert db.statements[2].endswith("(24,'n24')")
+
+
+def test_chunk_by_bytes(db):
+    """按字节预算分块，每块不超过 max_bytes"""
+    rows = [(i, 'x' * 100) for i in range(50)]
+    max_bytes = 1024 + 1000
+    result = db.bulk_insert('t', rows, columns=['id', 'v'], max_bytes=max_bytes)
+    assert result.rowcount == 50
+    assert result.statements > 1
+    assert all(len(sql.encode('utf-8')) <= max_bytes for sql in db.statements)
+    values = ','.join(sql.split(' VALUES ', 1)[1] for sql in db.statements)
+    assert values == ','.join(Connection.escape(row) for row in rows)
+
+
+def test_single_oversized_row(db):
+    """单行超过预算时单独成块，不会丢失"""
+    db.bulk_insert('t', [(1, 'x' * 5000), (2, 'y')], columns=['id', 'v'], max_bytes=2048)
+    assert len(db.statements) == 2
+
+
+def test_upsert_and_ignore(db):
+    """ON DUPLICATE KEY UPDATE / INSERT IGNORE 不返回 ID 范围"""
+    result = db.bulk_upsert('t', [{'id': 1, 'v': 'a'}], update=['v'])
+    assert db.statements[-1].endswith("ON DUPLICATE KEY UPDATE `v` = VALUES(`v`)")
+    assert result.id_ranges == []
+    result = db.bulk_insert('t', [(1, 'a')], columns=['id', 'v'], ignore=True)
+    assert db.statements[-1].startswith("INSERT IGNORE INTO `t`")
+    assert result.id_ranges == []
+
+
+def test_empty_and_missing_columns(db):
+    """空输入不执行语句；非字典行必须指定列"""
+    assert db.bulk_insert('t', []) == (0, [], 0)
+    assert db.statements == []
+    with pytest.raises(ValueError):
+        db.bulk_insert('t', [(1, 2)])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QueryCache 失效和表名提取测试
+"""
+
+from tt.cache import MISS, QueryCache, read_tables, write_tables
+
+
+def test_read_tables():
+    """提取 FROM / JOIN 引用的表"""
+    sql = "SELECT * FROM `db`.`Users` u, items i JOIN orders o ON o.uid = u.id WHERE u.id = %s"
+    assert read_tables(sql) == {'users', 'orders', 'items'}
+
+
+def test_write_tables():
+    """写语句的表名；只读语句为空集合；无法判断时为 None"""
+    assert write_tables("INSERT IGNORE INTO `users` (id) VALUES (1)") == {'users'}
+    assert write_tables("UPDATE users u JOIN orders o ON o.uid = u.id SET u.n = 1") == {'users', 'orders'}
+    assert write_tables("INSERT INTO archive SELECT * FROM users") == {'archive', 'users'}
+    assert write_tables("DELETE FROM users WHERE id = 1") == {'users'}
+    assert write_tables("SELECT 1") == set()
+    assert write_tables("CALL refresh()") is None
+
+
+def test_invalidate_by_table():
+    """只失效依赖被修改表的缓存项"""
+    cache = QueryCache(ttl=60)
+    users = QueryCache.make_key("SELECT * FROM users", None, 'dict')
+    joined = QueryCache.make_key("SELECT * FROM users JOIN orders", None, 'dict')
+    orders = QueryCache.make_key("SELECT * FROM orders", None, 'dict')
+    cache.set(users, [{'id': 1}], {'users'})
+    cache.set(joined, [{'id': 1}], {'users', 'orders'})
+    cache.set(orders, [{'id': 2}], {'orders'})
+
+    cache.invalidate({'users'})
+    assert cache.get(users) is MISS
+    assert cache.get(joined) is MISS
+    assert cache.get(orders) == [{'id': 2}]
+    assert cache.stats()['invalidations'] == 1
+
+    cache.invalidate()
+    assert cache.get(orders) is MISS
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+def test_stale_result_discarded_after_invalidation():
+    """查询期间表被修改时，写回的旧结果被丢弃"""
+    cache = QueryCache(ttl=60)
+    key = QueryCache.make_key("SELECT * FROM users WHERE id = %s", [1], 'dict')
+    version = cache.version({'users'})
+    cache.invalidate({'users'})
+    cache.set(key, [{'id': 1}], {'users'}, version=version)
+    assert cache.get(key) is MISS
+
+    cache.set(key, [{'id': 1}], {'users'}, version=cache.version({'users'}))
+    assert cache.get(key) == [{'id': 1}]
+
+    # 清空全部缓存同样使之前取得的版本失效
+    version = cache.version({'users'})
+    cache.clear()
+    cache.set(key, [{'id': 1}], {'users'}, version=version)
+    assert cache.get(key) is MISS
+
+
+def test_cached_value_is_copied():
+    """调用方修改结果不影响缓存"""
+    cache = QueryCache(ttl=60)
+    key = QueryCache.make_key("SELECT * FROM users", None, 'dict')
+    rows = [{'id': 1}]
+    cache.set(key, rows, {'users'})
+    rows[0]['id'] = 2
+    cache.get(key)[0]['id'] = 3
+    assert cache.get(key) == [{'id': 1}]
+
+
+def test_lru_eviction_and_ttl():
+    """按条数淘汰最久未使用的项，ttl 为 0 时不缓存"""
+    cache = QueryCache(ttl=60, max_entries=2)
+    for i in range(3):
+        cache.set(('q', i), [i], {'t'})
+    assert cache.get(('q', 0)) is MISS
+    assert cache.get(('q', 2)) == [2]
+    assert cache.stats()['evictions'] == 1
+    cache.set(('q', 9), [9], {'t'}, ttl=0)
+    assert cache.get(('q', 9)) is MISS
+    assert QueryCache.make_key("SELECT %s", [[1]], 'dict') is None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HandlerGroup 溢出策略和顺序测试
+"""
+
+import asyncio
+
+import pytest
+
+from tt.dispatch import HandlerGroup
+
+
+class Event:
+    """只带 chat_id 的事件"""
+
+    def __init__(self, chat_id, n):
+        self.chat_id = chat_id
+        self.n = n
+
+
+def make_handler(gate=None):
+    """返回 (处理器, 已处理的事件序号列表)；gate 未放行时处理器等待"""
+    handled = []
+
+    async def handler(event):
+        if gate is not None:
+            await gate.wait()
+        handled.append(event.n)
+
+    return handler, handled
+
+
+def test_invalid_policy():
+    """不支持的溢出策略"""
+    with pytest.raises(ValueError):
+        HandlerGroup('g', overflow='spill')
+
+
+def test_drop_new_events_when_full():
+    """drop：队列满时丢弃新事件"""
+    async def main():
+        gate = asyncio.Event()
+        handler, handled = make_handler(gate)
+        group = HandlerGroup('g', workers=1, max_queue=2, overflow='drop')
+        for n in range(5):
+            await group.put(handler, Event(1, n))
+        dropped = group.dropped
+        gate.set()
+        await group.close()
+        return handled, dropped
+
+    handled, dropped = asyncio.run(main())
+    assert handled == [0, 1]
+    assert dropped == 3
+
+
+def test_shed_oldest_when_full():
+    """shed_oldest：队列满时丢弃最早的事件，保留最新的"""
+    async def main():
+        gate = asyncio.Event()
+        handler, handled = make_handler(gate)
+        group = HandlerGroup('g', workers=1, max_queue=2, overflow='shed_oldest')
+        for n in range(5):
+            await group.put(handler, Event(1, n))
+        dropped = group.dropped
+        gate.set()
+        await group.close()
+        return handled, dropped
+
+    handled, dropped = asyncio.run(main())
+    assert handled == [3, 4]
+    assert dropped == 3
+
+
+def test_block_waits_for_space():
+    """block：队列满时 put 等待，不丢弃事件"""
+    async def main():
+        gate = asyncio.Event()
+        handler, handled = make_handler(gate)
+        group = HandlerGroup('g', workers=1, max_queue=1, overflow='block')
+        await group.put(handler, Event(1, 0))
+        # 工作协程取走第一个事件后阻塞在处理器中
+        await asyncio.sleep(0)
+        await group.put(handler, Event(1, 1))
+        blocked = asyncio.ensure_future(group.put(handler, Event(1, 2)))
+        await asyncio.sleep(0.05)
+        was_blocked = not blocked.done()
+        gate.set()
+        await blocked
+        await group.close()
+        return handled, was_blocked, group.dropped
+
+    handled, was_blocked, dropped = asyncio.run(main())
+    assert was_blocked
+    assert handled == [0, 1, 2]
+    assert dropped == 0
+
+
+def test_per_chat_order_and_stats():
+    """同一聊天按到达顺序处理，处理器异常计入 errors"""
+    async def main():
+        handled = {}
+
+        async def handler(event):
+            if event.n == 3:
+                raise RuntimeError("boom")
+            await asyncio.sleep(0.001 * (event.n % 3))
+            handled.setdefault(event.chat_id, []).append(event.n)
+
+        group = HandlerGroup('g', workers=4, max_queue=100)
+        for n in range(20):
+            await group.put(handler, Event(n % 3, n))
+        await group.close()
+        return handled, group.stats()
+
+    handled, stats = asyncio.run(main())
+    for chat_id, ns in handled.items():
+        assert ns == sorted(ns)
+    assert stats['handled'] == 20
+    assert stats['errors'] == 1
+    assert stats['depth'] == 0
+    assert stats['max_depth'] >= 1
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tt.log 日志组件测试
+"""
+
+import glob
+import gzip
+import logging
+import os
+
+import pytest
+
+from tt.log import RateLimitFilter, RotatingFileSink
+
+
+class ListHandler(logging.Handler):
+    """把记录保存在列表中"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger(request):
+    """不向上传递的独立日志记录器"""
+    logger = logging.getLogger(f"tt-test.{request.node.name}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger
+    logger.handlers.clear()
+
+
+def test_rate_limit_per_key(logger):
+    """每个消息模板单独计数，超过突发数后丢弃"""
+    handler = ListHandler()
+    log_filter = RateLimitFilter(rate=0.001, burst=3)
+    handler.addFilter(log_filter)
+    logger.addHandler(handler)
+    for i in range(10):
+        logger.warning("重连 %s", i)
+    for i in range(2):
+        logger.warning("限流 %s", i)
+    messages = [r.getMessage() for r in handler.records]
+    assert messages == ["重连 0", "重连 1", "重连 2", "限流 0", "限流 1"]
+    assert log_filter.dropped == 7
+
+
+def test_suppressed_count_on_recovery(logger, monkeypatch):
+    """恢复输出时第一条记录附带期间丢弃的条数"""
+    now = [1000.0]
+    monkeypatch.setattr('tt.log.time.monotonic', lambda: now[0])
+    handler = ListHandler()
+    handler.addFilter(RateLimitFilter(rate=1, burst=1))
+    logger.addHandler(handler)
+    for _ in range(4):
+        logger.info("tick")
+    now[0] += 1
+    logger.info("tick")
+    assert len(handler.records) == 2
+    assert handler.records[1].fields == {'suppressed': 3}
+
+
+def test_explicit_key(logger):
+    """通过 extra 指定的 log_key 覆盖默认的消息模板键"""
+    handler = ListHandler()
+    handler.addFilter(RateLimitFilter(rate=0.001, burst=1))
+    logger.addHandler(handler)
+    logger.info("a", extra={'log_key': 'same'})
+    logger.info("b", extra={'log_key': 'same'})
+    logger.info("c", extra={'log_key': 'other'})
+    assert [r.msg for r in handler.records] == ["a", "c"]
+
+
+def test_sampling(logger):
+    """按比例确定性采样"""
+    handler = ListHandler()
+    handler.addFilter(RateLimitFilter(rate=None, sample=0.25))
+    logger.addHandler(handler)
+    for i in range(100):
+        logger.debug("sample %s", i)
+    assert len(handler.records) == 25
+
+
+def test_child_logger_records_are_limited(logger):
+    """过滤器挂在处理器上，子记录器向上传递的记录同样限流"""
+    handler = ListHandler()
+    handler.addFilter(RateLimitFilter(rate=0.001, burst=2))
+    logger.addHandler(handler)
+    child = logging.getLogger(f"{logger.name}.network")
+    for i in range(10):
+        child.info("断开 %s", i)
+    assert len(handler.records) == 2
+
+
+def test_counted_once_across_handlers(logger):
+    """同一记录经过多个处理器时只计数一次，各处理器结果一致"""
+    log_filter = RateLimitFilter(rate=0.001, burst=2)
+    first, second = ListHandler(), ListHandler()
+    for handler in (first, second):
+        handler.addFilter(log_filter)
+        logger.addHandler(handler)
+    for i in range(5):
+        logger.info("x %s", i)
+    assert [r.getMessage() for r in first.records] == ["x 0", "x 1"]
+    assert [r.getMessage() for r in second.records] == ["x 0", "x 1"]
+    assert log_filter.dropped == 3
+
+
+def make_record(msg, level=logging.INFO):
+    return logging.LogRecord('tt-test', level, __file__, 1, msg, None, None)
+
+
+def backups(sink):
+    return sorted(glob.glob(glob.escape(sink.path) + '.*'))
+
+
+def test_sink_rotates_by_size_and_compresses(tmp_path):
+    """超过 max_bytes 时轮转，历史文件在后台压缩，内容完整"""
+    sink = RotatingFileSink(str(tmp_path / 'logs' / 'app.log'), max_bytes=200, backup_count=0,
+                            compress='gzip')
+    sink.setFormatter(logging.Formatter('%(message)s'))
+    lines = [f"line {i:03d} " + 'x' * 40 for i in range(20)]
+    for line in lines:
+        sink.emit(make_record(line))
+    sink.close()
+
+    files = backups(sink)
+    assert files and all(f.endswith('.gz') for f in files)
+    assert all(os.path.getsize(f) for f in files)
+    content = b''
+    for f in sorted(files, key=sink._backup_order):
+        with gzip.open(f, 'rb') as fh:
+            content += fh.read()
+    with open(sink.path, 'rb') as fh:
+        content += fh.read()
+    assert content.decode('utf-8').splitlines() == lines
+
+
+def test_sink_keeps_newest_backups(tmp_path):
+    """只保留 backup_count 个最新的历史文件"""
+    sink = RotatingFileSink(str(tmp_path / 'app.log'), max_bytes=50, backup_count=2, compress=None)
+    sink.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(6):
+        sink.emit(make_record(f"{i}" + 'y' * 45))
+    sink.close()
+
+    files = backups(sink)
+    assert len(files) == 2
+    kept = []
+    for f in sorted(files, key=sink._backup_order):
+        with open(f) as fh:
+            kept.append(fh.read()[0])
+    assert kept == ['3', '4']
+    with open(sink.path) as fh:
+        assert fh.read()[0] == '5'
+
+
+def test_sink_flushes_errors_immediately(tmp_path):
+    """ERROR 记录立即写入文件，INFO 记录留在缓冲区"""
+    sink = RotatingFileSink(str(tmp_path / 'app.log'), flush_interval=60)
+    sink.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        sink.emit(make_record('info'))
+        assert os.path.getsize(sink.path) == 0
+        sink.emit(make_record('error', logging.ERROR))
+        with open(sink.path) as fh:
+            assert fh.read() == 'info\nerror\n'
+    finally:
+        sink.close()
+
+
+def test_sink_invalid_options(tmp_path):
+    """不支持的压缩方式和轮转周期"""
+    with pytest.raises(ValueError):
+        RotatingFileSink(str(tmp_path / 'a.log'), compress='bz2')
+    with pytest.raises(ValueError):
+        RotatingFileSink(str(tmp_path / 'a.log'), when='week')
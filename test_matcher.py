@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KeywordMatcher 增删关键词和正则测试
+"""
+
+import re
+
+import pytest
+
+from tt.matcher import KeywordMatcher
+
+
+def test_keywords_case_insensitive_and_overlapping():
+    """默认不区分大小写，重叠的关键词都会返回"""
+    matcher = KeywordMatcher()
+    matcher.update(['he', 'she', ('hers', 'rule-1')])
+    matches = matcher.find_all('uSHErs')
+    assert [(m.pattern, m.value, m.start, m.end) for m in matches] == [
+        ('she', 'she', 1, 4), ('he', 'he', 2, 4), ('hers', 'rule-1', 2, 6),
+    ]
+    assert matcher.search('nothing') is None
+
+
+def test_add_remove_without_merge():
+    """增删关键词在合并前后结果一致"""
+    matcher = KeywordMatcher(merge_threshold=2)
+    matcher.update(['alpha', 'beta', 'gamma', 'delta'])
+    matcher.add('omega')
+    assert matcher.remove('beta')
+    assert not matcher.remove('beta')
+    assert matcher.values('alpha beta omega') == ['alpha', 'omega']
+    # 超过 merge_threshold 后重建主自动机
+    for word in ('x1', 'x2', 'x3'):
+        matcher.add(word)
+    matcher.remove('alpha')
+    assert matcher.values('alpha beta omega x2') == ['omega', 'x2']
+    # 删除后重新添加
+    matcher.add('beta', 'b')
+    assert matcher.values('beta') == ['b']
+    assert len(matcher) == 7
+
+
+def test_empty_keyword():
+    """关键词不能为空"""
+    with pytest.raises(ValueError):
+        KeywordMatcher().add('')
+
+
+def test_regex_chunks():
+    """正则分组合并，增删只重新编译所在分组"""
+    matcher = KeywordMatcher(regex_chunk=2)
+    matcher.update([r'\d{3}', r'foo\w+', r'ba[rz]'], regex=True)
+    assert len(matcher._chunks) == 2
+    assert [m.pattern for m in matcher.find_all('foo1 123 baz')] == [r'foo\w+', r'\d{3}', r'ba[rz]']
+    assert matcher.remove_regex(r'ba[rz]')
+    assert len(matcher._chunks) == 1
+    assert not matcher.remove_regex(r'ba[rz]')
+    matcher.add_regex(r'\d{3}', 'digits')
+    assert matcher.search('x 456').value == 'digits'
+
+
+def test_regex_inline_flags_are_scoped():
+    """开头的全局内联标志只作用于该正则"""
+    matcher = KeywordMatcher(case_sensitive=True)
+    matcher.add_regex('foo')
+    matcher.add_regex('(?i)bar')
+    assert [m.pattern for m in matcher.find_all('FOO BAR foo')] == ['(?i)bar', 'foo']
+    with pytest.raises((ValueError, re.error)):
+        matcher.add_regex('a(?i)b')
+    assert len(matcher) == 2
+
+
+def test_regex_merge_failure_rolls_back():
+    """组合正则编译失败时不修改匹配器"""
+    matcher = KeywordMatcher()
+    matcher.add_regex('(?P<word>a)')
+    with pytest.raises(re.error):
+        matcher.add_regex('(?P<word>b)')
+    assert len(matcher) == 1
+    assert matcher.search('b') is None
+    assert matcher.search('a').pattern == '(?P<word>a)'
+
+    with pytest.raises(re.error):
+        matcher.update(['ok', '(?P<word>c)'], regex=True)
+    assert len(matcher) == 1
+    assert matcher.search('ok') is None
+
+
+def test_event_filter():
+    """作为 Telethon 事件过滤器使用"""
+    class Event:
+        raw_text = 'free money now'
+
+    matcher = KeywordMatcher()
+    matcher.add('money', 'spam')
+    event = Event()
+    assert matcher(event)
+    assert event.keyword_matches[0].value == 'spam'
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TokenBucket 和 SendQueue 调度测试
+"""
+
+import asyncio
+import time
+
+import pytest
+from telethon import errors
+
+from tt.sender import HIGH, LOW, SendQueue, TokenBucket
+
+
+class FloodWait(errors.FloodWaitError):
+    """不依赖 Telethon 构造参数的 FloodWaitError"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+class FakeClient:
+    """记录发送顺序的客户端"""
+
+    def __init__(self, name, delay=0.0, failures=None):
+        self.session_name = name
+        self.delay = delay
+        self.failures = list(failures or [])
+        self.sent = []
+        self.flood_sleep_threshold = 60
+
+    async def send_message(self, entity, message, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(message)
+        return (self.session_name, message)
+
+
+def test_token_bucket_burst_and_refill():
+    """桶满时允许突发，之后按速率补充"""
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    assert bucket.delay(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.delay(now) == pytest.approx(0.1)
+    assert bucket.delay(now + 0.11) == 0
+
+
+def test_token_bucket_overdraft():
+    """透支的令牌折算为等待秒数，并由后续补充抵扣"""
+    bucket = TokenBucket(rate=100, capacity=10)
+    now = bucket.updated
+    assert bucket.take(now, 30) == pytest.approx(0.2)
+    assert bucket.delay(now + 0.1) > 0
+    assert bucket.delay(now + 0.21) == 0
+
+
+def test_flood_sleep_threshold_disabled():
+    """队列接管 FloodWait，客户端不再原地等待"""
+    client = FakeClient('a')
+    SendQueue([client])
+    assert client.flood_sleep_threshold == 0
+
+
+def test_priority_order():
+    """同一账号按优先级发送"""
+    async def main():
+        client = FakeClient('a')
+        queue = SendQueue(client, account_rate=1000, account_burst=1000, chat_rate=1000, chat_burst=1000)
+        futures = [
+            queue.submit('u1', 'low', priority=LOW),
+            queue.submit('u2', 'normal'),
+            queue.submit('u3', 'high', priority=HIGH),
+        ]
+        await asyncio.gather(*futures)
+        await queue.close()
+        return client.sent
+
+    # 调度任务在首次提交后才运行，三条消息都已排队
+    assert asyncio.run(main()) == ['high', 'normal', 'low']
+
+
+def test_chat_rate_limit_keeps_order():
+    """同一聊天按速率发送且保持提交顺序"""
+    async def main():
+        client = FakeClient('a')
+        queue = SendQueue(client, account_rate=1000, account_burst=1000, chat_rate=20, chat_burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*(queue.submit('chat', i) for i in range(5)))
+        elapsed = time.monotonic() - started
+        await queue.close()
+        return client.sent, elapsed
+
+    sent, elapsed = asyncio.run(main())
+    assert sent == list(range(5))
+    assert elapsed >= 4 / 20 * 0.9
+
+
+def test_flood_wait_moves_to_other_account():
+    """账号被限流后暂停，消息交给其他账号"""
+    async def main():
+        limited = FakeClient('limited', failures=[FloodWait(60)])
+        other = FakeClient('other')
+        queue = SendQueue([limited, other], account_rate=1000, account_burst=1000)
+        result = await asyncio.wait_for(queue.send('u', 'hi'), 5)
+        stats = queue.stats()
+        await queue.close(drain=False)
+        return result, stats
+
+    result, stats = asyncio.run(main())
+    assert result == ('other', 'hi')
+    assert stats['flood_waits'] == 1
+    assert stats['parked_accounts'] == 1
+
+
+def test_flood_wait_too_long_fails():
+    """FloodWait 超过 max_flood_wait 时消息直接失败"""
+    async def main():
+        client = FakeClient('a', failures=[FloodWait(7200)])
+        queue = SendQueue(client, max_flood_wait=3600)
+        try:
+            with pytest.raises(errors.FloodWaitError):
+                await asyncio.wait_for(queue.send('u', 'hi'), 5)
+            return queue.stats()['failed']
+        finally:
+            await queue.close(drain=False)
+
+    assert asyncio.run(main()) == 1
+
+
+def test_max_pending():
+    """排队消息达到上限时 submit 抛出 QueueFull"""
+    async def main():
+        queue = SendQueue(FakeClient('a'), max_pending=2)
+        queue.submit('u1', 1)
+        queue.submit('u2', 2)
+        with pytest.raises(asyncio.QueueFull):
+            queue.submit('u3', 3)
+        await queue.close(drain=False)
+
+    asyncio.run(main())
+
+
+def test_drain_with_cancelled_jobs():
+    """被调用方取消的消息不会让 drain 空转或卡住"""
+    async def main():
+        client = FakeClient('a', delay=0.01)
+        queue = SendQueue(client, account_rate=1000, account_burst=1000, chat_rate=1000, chat_burst=1000)
+        futures = [queue.submit(f'u{i}', i) for i in range(10)]
+        for future in futures[5:]:
+            future.cancel()
+        await asyncio.wait_for(queue.drain(), 5)
+        await queue.close()
+        return client.sent
+
+    assert asyncio.run(main()) == list(range(5))
+
+
+def test_close_without_drain_cancels_pending():
+    """close(drain=False) 取消未发送的消息"""
+    async def main():
+        client = FakeClient('a')
+        queue = SendQueue(client, account_rate=0.001, account_burst=1)
+        first = queue.submit('u1', 1)
+        second = queue.submit('u2', 2)
+        await first
+        await asyncio.wait_for(queue.close(drain=False), 5)
+        return second.cancelled()
+
+    assert asyncio.run(main())
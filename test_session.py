@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DBSession 批量写入失败重试测试（不连接数据库）
+"""
+
+import datetime
+
+import pytest
+
+from tt.session import DBSession
+
+
+class DB:
+    """记录 bulk_upsert 调用，failing 为 True 时抛出异常"""
+
+    def __init__(self):
+        self.failing = False
+        self.calls = []
+
+    def bulk_upsert(self, table, rows, columns):
+        self.calls.append((table, rows))
+        if self.failing:
+            raise RuntimeError("database is down")
+
+
+class State:
+    """只带 Telethon 更新状态字段的对象"""
+
+    def __init__(self, pts):
+        self.pts = pts
+        self.qts = 0
+        self.seq = 0
+        self.date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(DBSession, '_load', lambda self: None)
+    return DBSession(DB(), 'account', max_dirty=2, flush_interval=60)
+
+
+def test_failed_flush_keeps_buffer(session):
+    """写入失败时数据留在缓冲中，下次写入时以新值为准"""
+    session.db.failing = True
+    session.set_update_state(1, State(10))
+    with pytest.raises(RuntimeError):
+        session.flush()
+    session.set_update_state(1, State(11))
+    session.set_update_state(2, State(20))
+
+    session.db.failing = False
+    session.flush()
+    table, rows = session.db.calls[-1]
+    assert table == 'tt_session_states'
+    assert sorted(row[2] for row in rows) == [11, 20]
+    assert session._dirty_states == {}
+
+
+def test_threshold_flush_failure_is_logged(session):
+    """更新处理中触发的写入失败不抛出，之后按 flush_interval 重试"""
+    session.db.failing = True
+    for pts in range(5):
+        session.set_update_state(pts, State(pts))
+    assert len(session.db.calls) == 1
+    assert len(session._dirty_states) == 5
@@ -2,7 +2,7 @@
 TT - Telegram 自动化工具库
 
 提供 Telegram 自动化开发所需的基础功能：
-- 数据库操作
+- 数据库操作（同步 / 异步）
 - Telegram 客户端封装
 - 日志管理
 - 配置管理
@@ -11,18 +11,86 @@ TT - Telegram 自动化工具库
 
 __version__ = '0.1.0'
 
-from .db import DB
-from .client import TGClient
-from .log import Logger, err, info, warn, debug, exception, setup_telethon_logger, get_now
-from .config import Config
-from .app import TelegramApp, TaskManager
+import importlib
+
+# 导出名称 -> 所在模块：首次访问时才导入对应模块（PEP 562），
+# 只用到 Config 或 DB 的脚本不会加载 telethon 等依赖
+_LAZY = {
+    # 数据库
+    'DB': '.db',
+    'ConnectionPool': '.pool',
+    'QueryCache': '.cache',
+    'QueryStats': '.stats',
+    'AsyncDB': '.async_db',
+    'WriteBuffer': '.buffer',
+    
+    # Telegram 客户端
+    'TGClient': '.client',
+    'TGClientPool': '.client_pool',
+    'EntityCache': '.entity_cache',
+    'KeywordMatcher': '.matcher',
+    'HistoryExporter': '.exporter',
+    'TransferThrottle': '.media',
+    'DBSession': '.session',
+    'SendQueue': '.sender',
+    'broadcast': '.broadcast',
+    
+    # 日志
+    'Logger': '.log',
+    'err': '.log',
+    'info': '.log',
+    'warn': '.log',
+    'debug': '.log',
+    'exception': '.log',
+    'setup_telethon_logger': '.log',
+    'get_now': '.log',
+    'enable_async_logging': '.log',
+    'flush_logs': '.log',
+    'enable_structured_logging': '.log',
+    'add_file_sink': '.log',
+    
+    # 配置
+    'Config': '.config',
+    
+    # 应用框架
+    'TelegramApp': '.app',
+    'TaskManager': '.app',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # 缓存到模块命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     # 数据库
     'DB',
+    'ConnectionPool',
+    'QueryCache',
+    'QueryStats',
+    'AsyncDB',
+    'WriteBuffer',
     
     # Telegram 客户端
     'TGClient',
+    'TGClientPool',
+    'EntityCache',
+    'KeywordMatcher',
+    'HistoryExporter',
+    'TransferThrottle',
+    'DBSession',
+    'SendQueue',
+    'broadcast',
     
     # 日志
     'Logger',
@@ -33,6 +101,10 @@ __all__ = [
     'exception',
     'setup_telethon_logger',
     'get_now',
+    'enable_async_logging',
+    'flush_logs',
+    'enable_structured_logging',
+    'add_file_sink',
     
     # 配置
     'Config',
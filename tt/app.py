@@ -1,7 +1,7 @@
 import asyncio
 import signal
 from typing import Callable, List
-from .log import Logger
+from .log import Logger, flush_logs
 from .config import Config
 
 
@@ -69,7 +69,7 @@ class TelegramApp:
             try:
                 await handler()
             except Exception as e:
-                self.logger.exception(f"启动处理器执行失败: {e}")
+                self.logger.exception("启动处理器执行失败: %s", e)
     
     async def _run_shutdown_handlers(self):
         """运行所有关闭处理器"""
@@ -77,7 +77,7 @@ class TelegramApp:
             try:
                 await handler()
             except Exception as e:
-                self.logger.exception(f"关闭处理器执行失败: {e}")
+                self.logger.exception("关闭处理器执行失败: %s", e)
     
     async def shutdown(self, sig=None):
         """
@@ -87,7 +87,7 @@ class TelegramApp:
             sig: 接收到的信号
         """
         if sig:
-            self.logger.info(f"接收到退出信号 {sig.name}...")
+            self.logger.info("接收到退出信号 %s...", sig.name)
         
         # 运行关闭处理器
         await self._run_shutdown_handlers()
@@ -102,6 +102,9 @@ class TelegramApp:
         await asyncio.gather(*tasks, return_exceptions=True)
         self.logger.info("任务已取消")
         
+        # 写出异步日志队列中剩余的记录
+        flush_logs()
+        
         if self.loop:
             self.loop.stop()
     
@@ -114,7 +117,7 @@ class TelegramApp:
             context: 异常上下文
         """
         msg = context.get("exception", context["message"])
-        self.logger.error(f"捕获到异常: {msg}")
+        self.logger.error("捕获到异常: %s", msg)
         self.logger.info("正在关闭...")
         asyncio.create_task(self.shutdown())
     
@@ -143,6 +146,7 @@ class TelegramApp:
             self.logger.info("关闭事件循环...")
             self.loop.close()
             self.logger.info("应用已结束")
+            flush_logs()
     
     async def run_async(self):
         """
@@ -185,11 +189,11 @@ class TaskManager:
             创建的任务
         """
         if name in self._tasks:
-            self.logger.warning(f"任务 {name} 已存在，将被替换")
+            self.logger.warning("任务 %s 已存在，将被替换", name)
         
         task = asyncio.create_task(coro)
         self._tasks[name] = task
-        self.logger.info(f"任务 {name} 已添加")
+        self.logger.info("任务 %s 已添加", name)
         return task
     
     def remove_task(self, name):
@@ -204,7 +208,7 @@ class TaskManager:
             if not task.done():
                 task.cancel()
             del self._tasks[name]
-            self.logger.info(f"任务 {name} 已移除")
+            self.logger.info("任务 %s 已移除", name)
     
     def get_task(self, name):
         """
@@ -224,7 +228,7 @@ class TaskManager:
         for name, task in self._tasks.items():
             if not task.done():
                 task.cancel()
-                self.logger.info(f"任务 {name} 已取消")
+                self.logger.info("任务 %s 已取消", name)
         
         await asyncio.gather(*self._tasks.values(), return_exceptions=True)
         self._tasks.clear()
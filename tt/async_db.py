@@ -0,0 +1,256 @@
+import asyncio
+import copy
+import functools
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from .cache import MISS
+from .db import DB, _fetchall, _fetchone
+from .rows import COLUMNAR_FORMATS
+
+
+_serial_lock = threading.Lock()
+
+
+async def _call_db(db, method, *args, **kwargs):
+    """
+    在事件循环中调用 AsyncDB 或 DB 的方法
+
+    AsyncDB 直接等待；启用连接池的 DB 放到默认线程池执行。单连接的 DB 不是线程安全的，
+    同一个 DB 的调用放到它专用的单线程池中依次执行，不会有两个线程同时使用该连接
+
+    Args:
+        db: AsyncDB 或 DB 对象
+        method: 方法名
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        方法返回值
+    """
+    func = getattr(db, method)
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    executor = None
+    if db.pool is None:
+        with _serial_lock:
+            if db._serial_executor is None:
+                db._serial_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tt-db-serial')
+            executor = db._serial_executor
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncDB:
+    """DB 的异步版本，在有界线程池中执行数据库调用，不阻塞事件循环"""
+
+    def __init__(self, db_name, pwd, host='127.0.0.1', port=3306, user='root',
+                 pool=None, max_workers=10, auto_commit=True, cache=None, stats=None,
+                 replicas=None, replica_policy='round_robin', read_your_writes=0):
+        """
+        初始化异步数据库
+
+        Args:
+            db_name: 数据库名称
+            pwd: 数据库密码
+            host: 数据库主机
+            port: 数据库端口
+            user: 数据库用户
+            pool: 连接池配置，同 DB；默认最大连接数与 max_workers 相同
+            max_workers: 执行数据库调用的线程数
+            auto_commit: 写操作后是否自动提交，同 DB
+            cache: 查询缓存，同 DB
+            stats: SQL 执行统计，同 DB
+            replicas: 从库列表，同 DB
+            replica_policy: 从库选择策略，同 DB
+            read_your_writes: 写操作后读取走主库的秒数，同 DB
+        """
+        options = dict(pool) if isinstance(pool, dict) else {}
+        options.setdefault('max_size', max_workers)
+        self.db = DB(db_name, pwd, host=host, port=port, user=user, pool=options,
+                     auto_commit=auto_commit, cache=cache, stats=stats, replicas=replicas,
+                     replica_policy=replica_policy, read_your_writes=read_your_writes)
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tt-db')
+        self._session = False
+
+    @classmethod
+    def from_config(cls, config, section='database', max_workers=10):
+        """
+        根据 Config 中的数据库配置创建 AsyncDB
+
+        Args:
+            config: Config 对象
+            section: 配置段名称
+            max_workers: 执行数据库调用的线程数
+
+        Returns:
+            AsyncDB 对象
+        """
+        return cls(max_workers=max_workers, **DB._config_kwargs(config, section))
+
+    async def __aenter__(self):
+        """进入异步上下文管理器时自动连接"""
+        await self.conn()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """退出异步上下文管理器时自动关闭"""
+        await self.close()
+        return False
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        在线程池中执行同步调用
+
+        Args:
+            func: 同步函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def _bound(self, cm):
+        """
+        在单个线程上进入同步上下文管理器，产出绑定该线程的 AsyncDB
+
+        DB 按线程固定连接，因此事务和固定连接内的调用都必须在同一线程执行。
+        """
+        if self._session:
+            session = self
+        else:
+            session = copy.copy(self)
+            session._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tt-db-session')
+            session._session = True
+        try:
+            await session._run(cm.__enter__)
+            try:
+                yield session
+            except BaseException as e:
+                await session._run(cm.__exit__, type(e), e, e.__traceback__)
+                raise
+            else:
+                await session._run(cm.__exit__, None, None, None)
+        finally:
+            if session is not self:
+                session._executor.shutdown(wait=False)
+
+    def connection(self):
+        """
+        在 async with 块内固定使用同一个连接
+
+        Returns:
+            异步上下文管理器，产出绑定该连接的 AsyncDB
+        """
+        return self._bound(self.db.connection())
+
+    def transaction(self):
+        """
+        显式事务，见 DB.transaction；块内请使用产出的对象执行调用
+
+        Returns:
+            异步上下文管理器，产出绑定事务连接的 AsyncDB
+        """
+        return self._bound(self.db.transaction())
+
+    async def commit(self):
+        """提交当前连接上的修改"""
+        await self._run(self.db.commit)
+
+    async def rollback(self):
+        """回滚当前连接上的修改"""
+        await self._run(self.db.rollback)
+
+    async def conn(self):
+        """建立数据库连接"""
+        await self._run(self.db.conn)
+
+    async def close(self):
+        """关闭连接池并停止线程池"""
+        await self._run(self.db.close)
+        self._executor.shutdown(wait=False)
+
+    async def query(self, sql, params=None, cache_ttl=None, row_format='dict'):
+        """查询数据，缓存命中时直接返回，不经过线程池"""
+        if not self._session:
+            value = self.db._cached(sql, params, _fetchall, cache_ttl, row_format)
+            if value is not MISS:
+                return value
+        return await self._run(self.db.query, sql, params, cache_ttl, row_format)
+
+    async def query_one(self, sql, params=None, cache_ttl=None, row_format='dict'):
+        """查询单条数据，缓存命中时直接返回，不经过线程池"""
+        if not self._session:
+            value = self.db._cached(sql, params, _fetchone, cache_ttl, row_format)
+            if value is not MISS:
+                return value
+        return await self._run(self.db.query_one, sql, params, cache_ttl, row_format)
+
+    async def iter_query(self, sql, params=None, batch_size=1000, batches=False, row_format='dict'):
+        """
+        异步流式查询，逐批在线程池中读取，见 DB.iter_query
+
+        Args:
+            sql: SQL 语句
+            params: 参数
+            batch_size: 每次从服务器读取的行数
+            batches: 为 True 时按批产出行列表，否则逐行产出
+            row_format: 行格式，见 DB.query；列式格式只能与 batches=True 一起使用
+
+        Yields:
+            行或行列表（列式格式时为每批的列式字典）
+        """
+        if row_format in COLUMNAR_FORMATS and not batches:
+            raise ValueError("列式格式需要 batches=True")
+        loop = asyncio.get_running_loop()
+        gen = self.db.iter_query(sql, params, batch_size=batch_size, batches=True, row_format=row_format)
+        fut = None
+        try:
+            while True:
+                fut = loop.run_in_executor(self._executor, next, gen, None)
+                rows = await asyncio.shield(fut)
+                if rows is None:
+                    break
+                if batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+        finally:
+            # 被取消时等待正在读取的批次结束，再关闭生成器
+            if fut is not None and not fut.done():
+                await asyncio.wait([fut])
+            await self._run(gen.close)
+
+    async def insert(self, sql, params=None):
+        """插入数据"""
+        return await self._run(self.db.insert, sql, params)
+
+    async def bulk_insert(self, table, rows, **kwargs):
+        """多行批量插入，参数见 DB.bulk_insert"""
+        return await self._run(self.db.bulk_insert, table, rows, **kwargs)
+
+    async def bulk_upsert(self, table, rows, **kwargs):
+        """批量插入或更新，参数见 DB.bulk_upsert"""
+        return await self._run(self.db.bulk_upsert, table, rows, **kwargs)
+
+    async def update(self, sql, params=None):
+        """更新数据"""
+        return await self._run(self.db.update, sql, params)
+
+    async def delete(self, sql, params=None):
+        """删除数据"""
+        return await self._run(self.db.delete, sql, params)
+
+    async def execute(self, sql, params=None):
+        """执行 SQL 语句"""
+        return await self._run(self.db.execute, sql, params)
+
+    async def execute_many(self, sql, params_list):
+        """批量执行 SQL 语句"""
+        return await self._run(self.db.execute_many, sql, params_list)
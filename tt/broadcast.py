@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import namedtuple
+from collections.abc import Sequence, Set
+from concurrent.futures import ThreadPoolExecutor
+from telethon import errors
+from .log import Logger
+
+
+BroadcastResult = namedtuple('BroadcastResult', ['sent', 'failed', 'skipped', 'elapsed'])
+
+# 因限流未送达的接收者：记录到检查点，下次运行重发
+_FLOOD_ERRORS = (errors.FloodWaitError, errors.SlowModeWaitError)
+
+# 同步迭代器（生成器、DB.iter_query 等）在后台线程中每次读取的数量
+_SYNC_BATCH = 500
+
+
+class Checkpoint:
+    """
+    群发进度检查点，保存到 JSON 文件
+
+    position 为接收者流中已全部处理完的位置；retry 为 position 之前因限流未送达、
+    下次运行需要重发的接收者下标
+    """
+
+    def __init__(self, path):
+        """
+        初始化检查点
+
+        Args:
+            path: 检查点文件路径
+        """
+        self.path = path
+        self.position = 0
+        self.sent = 0
+        self.failed = 0
+        self.retry = []
+        self.load()
+
+    def load(self):
+        """读取已保存的进度，文件不存在时从头开始"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self.position = data.get('position', 0)
+        self.sent = data.get('sent', 0)
+        self.failed = data.get('failed', 0)
+        self.retry = data.get('retry', [])
+
+    def save(self):
+        """原子地写入进度（先写临时文件再重命名）"""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'position': self.position, 'sent': self.sent, 'failed': self.failed, 'retry': self.retry}, f
+            )
+        os.replace(tmp, self.path)
+
+
+async def broadcast(sender, entities, message, concurrency=10, checkpoint=None, key=None,
+                    report_every=1000, on_report=None, checkpoint_interval=5.0, logger=None, **kwargs):
+    """
+    向大量接收者群发消息
+
+    接收者以流的方式读取，不会一次性载入内存；最多 concurrency 条消息同时发送。
+    使用检查点时，接收者流每次运行必须按相同顺序产出（如带 ORDER BY 的查询），
+    中断后重新运行会跳过已处理的部分；因 FloodWait / 慢速模式未送达的接收者记录在检查点中，
+    下次运行时重发。
+
+    列表、元组等序列直接遍历；其他同步迭代器（生成器、DB.iter_query() 等）在后台线程中
+    分批读取，避免阻塞事件循环。
+
+    Args:
+        sender: TGClient、TGClientPool 或 SendQueue
+        entities: 接收者的可迭代对象或异步可迭代对象（如 AsyncDB.iter_query() 的结果）
+        message: 消息内容，或接收 entity 返回消息内容的函数
+        concurrency: 同时发送的消息数
+        checkpoint: 检查点文件路径或 Checkpoint 对象，None 表示不记录进度
+        key: 接收者为查询行时取目标实体的列名（字典行）或下标（元组行）
+        report_every: 每处理多少个接收者汇报一次
+        on_report: 汇报回调，参数为 [(entity, 结果或异常), ...]
+        checkpoint_interval: 两次保存检查点的最短间隔（秒）
+        logger: 日志记录器
+        **kwargs: 传给 send_message 的其他参数
+
+    Returns:
+        BroadcastResult(sent, failed, skipped, elapsed)：本次运行的成功数、失败数（含限流未送达）、
+        因检查点实际跳过的接收者数和耗时（秒）
+    """
+    logger = logger or Logger()
+    if checkpoint is not None and not isinstance(checkpoint, Checkpoint):
+        checkpoint = Checkpoint(checkpoint)
+    send = sender.send if hasattr(sender, 'submit') else sender.send_message
+    skip = checkpoint.position if checkpoint is not None else 0
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    started = time.monotonic()
+    state = {'sent': 0, 'failed': 0, 'skipped': 0, 'position': skip, 'saved_at': started}
+    retry = set(checkpoint.retry) if checkpoint is not None else set()
+    done = set()
+    outcomes = []
+
+    def flush_report():
+        if not outcomes:
+            return
+        batch = outcomes[:]
+        outcomes.clear()
+        logger.info(
+            "群发进度: 成功 %d，失败 %d，位置 %d，耗时 %.1f 秒",
+            state['sent'], state['failed'], state['position'], time.monotonic() - started,
+        )
+        if on_report is not None:
+            on_report(batch)
+
+    def save_checkpoint(force=False):
+        if checkpoint is None:
+            return
+        now = time.monotonic()
+        if not force and now - state['saved_at'] < checkpoint_interval:
+            return
+        checkpoint.position = state['position']
+        checkpoint.retry = sorted(retry)
+        checkpoint.sent += state['sent'] - state.get('saved_sent', 0)
+        checkpoint.failed += state['failed'] - state.get('saved_failed', 0)
+        state['saved_sent'], state['saved_failed'] = state['sent'], state['failed']
+        state['saved_at'] = now
+        checkpoint.save()
+
+    def finish(index, entity, outcome):
+        outcomes.append((entity, outcome))
+        if isinstance(outcome, _FLOOD_ERRORS):
+            retry.add(index)
+        else:
+            retry.discard(index)
+        if index < skip:
+            # 上次运行遗留的重发，不影响位置
+            return
+        # 乱序完成：只有前面的接收者都处理完，检查点位置才向后推进
+        done.add(index)
+        while state['position'] in done:
+            done.discard(state['position'])
+            state['position'] += 1
+        if len(outcomes) >= report_every:
+            flush_report()
+        save_checkpoint()
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, entity = item
+            try:
+                text = message(entity) if callable(message) else message
+                outcome = await send(entity, text, **kwargs)
+                state['sent'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                outcome = e
+                state['failed'] += 1
+            finish(index, entity, outcome)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        index = 0
+        async for entity in _iterate(entities):
+            if index >= skip or index in retry:
+                if key is not None:
+                    entity = entity[key]
+                await queue.put((index, entity))
+            else:
+                state['skipped'] += 1
+            index += 1
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        flush_report()
+        save_checkpoint(force=True)
+
+    return BroadcastResult(state['sent'], state['failed'], state['skipped'], time.monotonic() - started)
+
+
+async def _iterate(entities):
+    """统一遍历同步和异步可迭代对象，同步迭代器在单独的线程中分批读取"""
+    if hasattr(entities, '__aiter__'):
+        async for entity in entities:
+            yield entity
+        return
+    if isinstance(entities, (Sequence, Set, dict)):
+        for entity in entities:
+            yield entity
+        return
+    iterator = iter(entities)
+    loop = asyncio.get_running_loop()
+    # 固定使用同一个线程：DB.iter_query 等迭代器依赖线程本地状态
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            batch = await loop.run_in_executor(executor, list, itertools.islice(iterator, _SYNC_BATCH))
+            for entity in batch:
+                yield entity
+            if len(batch) < _SYNC_BATCH:
+                return
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,195 @@
+import asyncio
+from .async_db import _call_db
+from .log import Logger
+
+
+class WriteBuffer:
+    """写缓冲：事件处理器只负责入队，后台任务按数量或时间阈值批量写入数据库"""
+
+    def __init__(self, db, table, columns=None, max_rows=1000, max_delay=1.0, max_queue=10000,
+                 on_duplicate=None, ignore=False, retries=3, logger=None):
+        """
+        初始化写缓冲
+
+        Args:
+            db: DB 或 AsyncDB 对象；DB 的写入会放到线程池执行，单连接的 DB 在专用线程中依次执行
+            table: 目标表名
+            columns: 列名列表，为 None 时取行字典的键
+            max_rows: 积累到此行数立即写入，同时也是单批最大行数
+            max_delay: 第一行入队后最多等待的秒数
+            max_queue: 队列容量，满时 put() 等待、put_nowait() 抛出 asyncio.QueueFull
+            on_duplicate: 传给 bulk_insert 的 on_duplicate
+            ignore: 是否使用 INSERT IGNORE
+            retries: 写入失败时的重试次数，重试耗尽后丢弃该批并记录日志
+            logger: 日志记录器
+        """
+        self.db = db
+        self.table = table
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.retries = retries
+        self.logger = logger or Logger()
+        self._options = dict(columns=columns, on_duplicate=on_duplicate, ignore=ignore)
+        self.max_queue = max_queue
+        # 队列和事件在首次入队时创建，Python 3.9 及以下会绑定创建时的事件循环
+        self._queue = None
+        self._full = None
+        self._task = None
+        self._flush_waiters = 0
+        self._rows_enqueued = 0
+        self._rows_rejected = 0
+        self._rows_written = 0
+        self._rows_failed = 0
+        self._flushes = 0
+        self._flush_time = 0.0
+        self._flush_max = 0.0
+        self._flush_last = 0.0
+
+    def attach(self, app):
+        """
+        在 TelegramApp 关闭时写入剩余数据
+
+        Args:
+            app: TelegramApp 对象
+        """
+        app.on_shutdown(self.close)
+        return self
+
+    async def put(self, row):
+        """
+        入队一行，队列满时等待（背压）
+
+        Args:
+            row: 行字典或序列
+        """
+        self._ensure_started()
+        await self._queue.put(row)
+        self._enqueued()
+
+    def put_nowait(self, row):
+        """
+        入队一行，不等待
+
+        Args:
+            row: 行字典或序列
+
+        Raises:
+            asyncio.QueueFull: 队列已满
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self._rows_rejected += 1
+            raise
+        self._enqueued()
+
+    async def flush(self):
+        """立即写入队列中的所有行并等待完成"""
+        if self._queue is None:
+            return
+        if self._task is None or self._task.done():
+            await self._drain()
+            return
+        self._flush_waiters += 1
+        self._full.set()
+        try:
+            await self._queue.join()
+        finally:
+            self._flush_waiters -= 1
+
+    async def close(self):
+        """写入剩余数据并停止后台任务"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        """
+        获取运行指标
+
+        Returns:
+            dict: 队列深度、入队/写入/失败/拒绝行数、写入次数及耗时（秒）
+        """
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'rows_enqueued': self._rows_enqueued,
+            'rows_rejected': self._rows_rejected,
+            'rows_written': self._rows_written,
+            'rows_failed': self._rows_failed,
+            'flushes': self._flushes,
+            'flush_latency_last': self._flush_last,
+            'flush_latency_avg': self._flush_time / self._flushes if self._flushes else 0.0,
+            'flush_latency_max': self._flush_max,
+        }
+
+    def _ensure_started(self):
+        """首次入队时创建队列并启动后台写入任务"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._full = asyncio.Event()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _enqueued(self):
+        """记录入队并在达到批量阈值时唤醒写入任务"""
+        self._rows_enqueued += 1
+        if self._queue.qsize() >= self.max_rows:
+            self._full.set()
+
+    async def _run(self):
+        """后台写入循环"""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            self._full.clear()
+            if queue.qsize() + 1 < self.max_rows and not self._flush_waiters:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_rows and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _drain(self):
+        """后台任务未运行时直接写完队列"""
+        queue = self._queue
+        while not queue.empty():
+            batch = []
+            while len(batch) < self.max_rows and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _write(self, batch):
+        """写入一批数据，失败时按指数退避重试"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for attempt in range(self.retries + 1):
+            try:
+                await _call_db(self.db, 'bulk_insert', self.table, batch, **self._options)
+                self._rows_written += len(batch)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self._rows_failed += len(batch)
+                    self.logger.exception("写缓冲 %s 写入失败，丢弃 %d 行: %s", self.table, len(batch), e)
+                else:
+                    self.logger.warning("写缓冲 %s 写入失败，第 %d 次重试: %s", self.table, attempt + 1, e)
+                    await asyncio.sleep(min(2 ** attempt, 30))
+
+        elapsed = loop.time() - start
+        self._flushes += 1
+        self._flush_time += elapsed
+        self._flush_last = elapsed
+        self._flush_max = max(self._flush_max, elapsed)
@@ -0,0 +1,270 @@
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+# 未命中标记
+MISS = object()
+
+_NAME = r'[\w`$.]+'
+_FROM_RE = re.compile(
+    r'\b(?:FROM|JOIN)\s+(.+?)(?=\bWHERE\b|\bGROUP\b|\bORDER\b|\bLIMIT\b|\bHAVING\b|\bUNION\b'
+    r'|\bFOR\b|\bLOCK\b|\bON\b|\bUSING\b|\bSET\b|\bVALUES?\b|\bSELECT\b|\bWINDOW\b'
+    r'|\b(?:LEFT|RIGHT|INNER|OUTER|CROSS|NATURAL|STRAIGHT_JOIN|JOIN)\b|[();]|$)',
+    re.IGNORECASE | re.DOTALL,
+)
+_WRITE_RE = re.compile(
+    r'^\s*(?:'
+    r'(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*(?:INTO\s+)?'
+    r'|UPDATE\s+(?:(?:LOW_PRIORITY|IGNORE)\s+)*'
+    r'|(?:TRUNCATE|ALTER|DROP|OPTIMIZE|LOCK)\s+(?:TABLES?\s+)?(?:IF\s+EXISTS\s+)?'
+    r'|RENAME\s+TABLE\s+'
+    r')(' + _NAME + r')',
+    re.IGNORECASE,
+)
+_READ_ONLY_RE = re.compile(r'^\s*(?:SELECT|SHOW|DESC|DESCRIBE|EXPLAIN|SET|USE|DO)\b', re.IGNORECASE)
+
+
+def _normalize_table(name):
+    """表名标准化：去掉反引号和库名前缀，转小写"""
+    return name.replace('`', '').rsplit('.', 1)[-1].lower()
+
+
+def read_tables(sql):
+    """
+    提取 SQL 中 FROM / JOIN 引用的表名
+
+    Args:
+        sql: SQL 语句
+
+    Returns:
+        set: 标准化后的表名集合
+    """
+    tables = set()
+    for clause in _FROM_RE.findall(sql):
+        for part in clause.split(','):
+            words = part.split()
+            if words and re.fullmatch(_NAME, words[0]):
+                tables.add(_normalize_table(words[0]))
+    return tables
+
+
+def write_tables(sql):
+    """
+    提取写语句影响的表名
+
+    Args:
+        sql: SQL 语句
+
+    Returns:
+        set: 表名集合；空集合表示不修改数据；None 表示无法判断，应清空全部缓存
+    """
+    match = _WRITE_RE.match(sql)
+    if match:
+        # 多表 UPDATE / DELETE 及 INSERT ... SELECT 引用的表一并失效，宁多勿漏
+        return {_normalize_table(match.group(1))} | read_tables(sql)
+    if re.match(r'^\s*DELETE\b', sql, re.IGNORECASE):
+        tables = read_tables(sql)
+        return tables or None
+    if _READ_ONLY_RE.match(sql):
+        return set()
+    return None
+
+
+def _sizeof(value):
+    """估算缓存值占用的字节数（行字典的键为共享字符串，不重复计算；array 自身已含数据）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for item in value.values():
+            size += _sizeof(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += _sizeof(item)
+    return size
+
+
+def _copy(value):
+    """复制查询结果，避免调用方修改缓存内容"""
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        # 列式结果的每列是 list 或 array，同样需要复制
+        return {k: v[:] if isinstance(v, (list, array)) else v for k, v in value.items()}
+    return value
+
+
+class QueryCache:
+    """查询结果缓存，支持 TTL、按条数和字节数的 LRU 淘汰及按表失效"""
+
+    def __init__(self, ttl=60, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        """
+        初始化查询缓存
+
+        Args:
+            ttl: 默认缓存秒数
+            max_entries: 最大缓存条数
+            max_bytes: 缓存结果的估算总字节数上限
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (值, 过期时间, 字节数, 表名集合)
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._versions = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(sql, params, kind):
+        """
+        生成缓存键
+
+        Args:
+            sql: SQL 语句
+            params: 参数
+            kind: 区分结果形式的标记
+
+        Returns:
+            可哈希的键，参数不可哈希时返回 None
+        """
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif isinstance(params, list):
+            params = tuple(params)
+        key = (sql, params, kind)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key, count_miss=True):
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+            count_miss: 未命中时是否计入统计（随后会回源并再次读取时传 False）
+
+        Returns:
+            缓存值的副本，未命中或已过期返回 MISS
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                if count_miss:
+                    self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(entry[0])
+
+    def version(self, tables):
+        """
+        读取表的版本号，执行查询前调用，写回时用于丢弃期间已失效的结果
+
+        Args:
+            tables: 表名集合
+
+        Returns:
+            版本标记
+        """
+        with self._lock:
+            return self._epoch, tuple(self._versions.get(t, 0) for t in sorted(tables))
+
+    def set(self, key, value, tables, ttl=None, version=None):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 查询结果
+            tables: 结果依赖的表名集合
+            ttl: 缓存秒数，None 使用默认值
+            version: 执行查询前 version() 的返回值
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl:
+            return
+        value = _copy(value)
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version is not None and version != (
+                self._epoch, tuple(self._versions.get(t, 0) for t in sorted(tables))
+            ):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size, tables)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tables=None):
+        """
+        使依赖指定表的缓存失效
+
+        Args:
+            tables: 表名集合，None 表示清空全部缓存
+        """
+        with self._lock:
+            self.invalidations += 1
+            if tables is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._by_table.clear()
+                self._bytes = 0
+                return
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in self._by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        self.invalidate(None)
+
+    def stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 命中、未命中、条数、字节数、淘汰和失效次数
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        """删除缓存条目（需持有锁）"""
+        value, _, size, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
@@ -1,10 +1,27 @@
+import asyncio
 from telethon import TelegramClient, errors
+from .broadcast import broadcast
+from .dispatch import HandlerGroup
+from .entity_cache import EntityCache, prewarm, resolve
+from .log import Logger, _ensure_telethon_logger
+from .media import PART_SIZE, download_fast, upload_fast
+
+
+# 说明会话已失效、需要重新登录的错误
+AUTH_ERRORS = (
+    errors.AuthKeyUnregisteredError,
+    errors.UserDeactivatedError,
+    errors.UserDeactivatedBanError,
+    errors.SessionRevokedError,
+)
 
 
 class TGClient:
     """Telegram 客户端封装类"""
     
-    def __init__(self, session_name, api_id, api_hash, proxy=None):
+    def __init__(self, session_name, api_id, api_hash, proxy=None, entity_cache=None,
+                 connect_retries=5, retry_delay=1, max_retry_delay=30, throttle=None, flood_sleep_threshold=60,
+                 sequential_updates=False):
         """
         初始化 Telegram 客户端
         
@@ -13,12 +30,83 @@ class TGClient:
             api_id: Telegram API ID
             api_hash: Telegram API Hash
             proxy: 代理设置，格式如 (socks.HTTP, "127.0.0.1", 7890)
+            entity_cache: 实体解析缓存：True 使用默认设置，dict 为 EntityCache 参数，
+                也可直接传入 EntityCache 对象；None 表示不缓存
+            connect_retries: Telethon 每次连接（含断线后的自动重连）失败时的重试次数；
+                首次连接时 ensure_connected 另外最多再按退避重试这么多轮
+            retry_delay: Telethon 重试的间隔秒数，也是首次连接退避的初始等待，之后每轮翻倍
+            max_retry_delay: 首次连接退避等待的上限（秒）
+            throttle: 媒体传输限速 TransferThrottle，多个客户端可共享同一个
+            flood_sleep_threshold: 不超过此秒数的 FloodWait 由 Telethon 自动等待后重试，
+                不抛出异常；需要自行处理限流（如换账号发送）时设为 0
+            sequential_updates: 逐个处理更新（Telethon 等待处理器返回后才处理下一个更新）。
+                事件处理组的 'block' 策略只有在此模式下才能反压更新处理；否则 Telethon
+                为每个更新创建任务，等待入队的任务数不受 max_queue 限制
         """
         self.session_name = session_name
         self.api_id = api_id
         self.api_hash = api_hash
         self.proxy = proxy
-        self.client = TelegramClient(session_name, api_id, api_hash, proxy=proxy)
+        self.connect_retries = connect_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.throttle = throttle
+        _ensure_telethon_logger()
+        # Telethon 的断线自动重连同样受 connection_retries 限制，为 0 时不会重连；
+        # ensure_connected 的退避只用于首次连接，之后的连接由 Telethon 负责重试
+        self.client = TelegramClient(
+            session_name, api_id, api_hash, proxy=proxy,
+            connection_retries=connect_retries, retry_delay=retry_delay, auto_reconnect=True,
+            flood_sleep_threshold=flood_sleep_threshold, sequential_updates=sequential_updates,
+        )
+        self.sequential_updates = sequential_updates
+        # 在 ensure_connected 中创建，避免 Python 3.9 及以下绑定到构造时的事件循环
+        self._connect_lock = None
+        self._ever_connected = False
+        self._authorized = None
+        self._me = None
+        self._groups = {}
+        if entity_cache is None or entity_cache is False or isinstance(entity_cache, EntityCache):
+            self.entity_cache = entity_cache or None
+        else:
+            self.entity_cache = EntityCache(**(entity_cache if isinstance(entity_cache, dict) else {}))
+        if self.entity_cache is not None and not self.entity_cache.account:
+            self.entity_cache.account = str(session_name)
+
+    async def ensure_connected(self):
+        """
+        确保已连接。首次连接失败时按指数退避重试；连接建立过之后 Telethon 的
+        自动重连已用尽重试次数，这里只再连接一次，不叠加退避
+        
+        Raises:
+            最后一次连接失败的异常
+        """
+        if self.client.is_connected():
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            delay = self.retry_delay
+            rounds = 0 if self._ever_connected else self.connect_retries
+            for attempt in range(rounds + 1):
+                if self.client.is_connected():
+                    return
+                try:
+                    await self.client.connect()
+                    self._ever_connected = True
+                    # 重新建立连接后授权状态可能已变化，需要重新确认
+                    self._authorized = None
+                    return
+                except Exception:
+                    if attempt == rounds:
+                        raise
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+
+    def _invalidate_auth(self, authorized=None):
+        """授权状态变化时清除缓存的授权状态和用户信息"""
+        self._authorized = authorized
+        self._me = None
 
     async def send_login_code(self, phone):
         """
@@ -40,7 +128,6 @@ class TGClient:
         except Exception as e:
             print(f"发送验证码失败: {e}")
         
-        await self.client.disconnect()
         return code_hash
 
     async def send_login(self, phone, pwd, code, code_hash):
@@ -56,54 +143,61 @@ class TGClient:
         Returns:
             me: 用户信息，登录失败返回 None
         """
-        await self.client.connect()
-        
-        if await self.client.is_user_authorized():
+        if await self.is_auth():
             return None
         
         me = None
         try:
-            await self.client.sign_in(phone, code=code, phone_code_hash=code_hash)
-            me = await self.client.get_me()
+            me = await self.client.sign_in(phone, code=code, phone_code_hash=code_hash)
         except errors.CodeInvalidError:
             print("验证码无效")
         except errors.SessionPasswordNeededError:
             # 需要两步验证密码
-            await self.client.sign_in(password=pwd)
-            me = await self.client.get_me()
+            me = await self.client.sign_in(password=pwd)
         except Exception as e:
             print(f"登录失败: {e}")
         
-        await self.client.disconnect()
+        if me is not None:
+            self._invalidate_auth(True)
+            self._me = me
         return me
 
-    async def is_auth(self):
+    async def is_auth(self, refresh=False):
         """
         检查是否已授权
         
+        连接保持期间复用上次的检查结果，重新连接或授权变化后才再次询问服务器。
+        
+        Args:
+            refresh: 是否忽略缓存重新检查
+        
         Returns:
             bool: 是否已授权
         """
-        if self.client.is_connected():
-            return await self.client.is_user_authorized()
-        else:
-            try:
-                await self.client.connect()
-                return await self.client.is_user_authorized()
-            except Exception as e:
-                print(f"连接异常: {e}")
-                return False
+        try:
+            await self.ensure_connected()
+        except Exception as e:
+            print(f"连接异常: {e}")
+            return False
+        if refresh or self._authorized is None:
+            self._invalidate_auth(await self.client.is_user_authorized())
+        return self._authorized
 
-    async def get_me(self):
+    async def get_me(self, refresh=False):
         """
-        获取当前用户信息
+        获取当前用户信息（缓存结果，授权变化后失效）
+        
+        Args:
+            refresh: 是否忽略缓存重新获取
         
         Returns:
             用户信息对象
         """
         if not await self.is_auth():
             return None
-        return await self.client.get_me()
+        if refresh or self._me is None:
+            self._me = await self.client.get_me()
+        return self._me
 
     async def start(self, phone=None, password=None, bot_token=None):
         """
@@ -118,34 +212,158 @@ class TGClient:
             await self.client.start(bot_token=bot_token)
         else:
             await self.client.start(phone=phone, password=password)
+        self._invalidate_auth(True)
 
     async def disconnect(self):
-        """断开连接"""
+        """先处理完各事件处理组中已排队的事件（处理器可能仍需发送消息），再断开连接"""
+        for group in self._groups.values():
+            await group.close()
         if self.client.is_connected():
             await self.client.disconnect()
+        if self.entity_cache is not None:
+            await self.entity_cache.flush()
 
-    async def send_message(self, entity, message):
+    async def send_message(self, entity, message, **kwargs):
         """
         发送消息
         
         Args:
             entity: 目标实体（用户名、ID 或实体对象）
             message: 消息内容
+            **kwargs: 传给 Telethon send_message 的其他参数
+        """
+        await self.ensure_connected()
+        try:
+            if self.entity_cache is not None:
+                entity = await resolve(self.client, entity, self.entity_cache)
+            return await self.client.send_message(entity, message, **kwargs)
+        except AUTH_ERRORS:
+            self._invalidate_auth(False)
+            raise
+
+    async def resolve(self, entity):
+        """
+        解析实体为 input peer，启用实体缓存时优先使用缓存
+        
+        Args:
+            entity: 用户名、手机号、ID 或实体对象
+            
+        Returns:
+            input peer
         """
-        return await self.client.send_message(entity, message)
+        if self.entity_cache is None:
+            return await self.client.get_input_entity(entity)
+        return await resolve(self.client, entity, self.entity_cache)
+
+    async def prewarm(self, entities, concurrency=3, max_flood_wait=60):
+        """
+        群发前批量预解析实体并写入缓存，已缓存的跳过
+        
+        Args:
+            entities: 实体列表
+            concurrency: 同时解析的数量
+            max_flood_wait: 遇到不超过此秒数的 FloodWait 时等待后继续，否则停止
+            
+        Returns:
+            dict: 解析失败的 {实体: 异常}
+        """
+        if self.entity_cache is None:
+            raise RuntimeError("未启用实体缓存")
+        return await prewarm(
+            self.client, entities, self.entity_cache, concurrency=concurrency, max_flood_wait=max_flood_wait
+        )
+
+    async def broadcast(self, entities, message, concurrency=10, **kwargs):
+        """
+        群发消息，参数见 tt.broadcast.broadcast()
+        
+        Returns:
+            BroadcastResult 对象
+        """
+        return await broadcast(self, entities, message, concurrency=concurrency, **kwargs)
+
+    async def download_media_fast(self, media, path, concurrency=8, part_size=PART_SIZE,
+                                  progress_callback=None):
+        """
+        并行分片下载媒体到文件，支持断点续传，参数见 tt.media.download_fast()
+        
+        Returns:
+            str: 保存路径
+        """
+        await self.ensure_connected()
+        return await download_fast(
+            self.client, media, path, concurrency=concurrency, part_size=part_size,
+            throttle=self.throttle, progress_callback=progress_callback,
+        )
+
+    async def upload_file_fast(self, path, concurrency=8, part_size=PART_SIZE, progress_callback=None):
+        """
+        并行分片上传文件，参数见 tt.media.upload_fast()
+        
+        Returns:
+            InputFile 或 InputFileBig，可传给 send_file()
+        """
+        await self.ensure_connected()
+        return await upload_fast(
+            self.client, path, concurrency=concurrency, part_size=part_size,
+            throttle=self.throttle, progress_callback=progress_callback,
+        )
 
     async def log_out(self):
         """登出账号"""
-        return await self.client.log_out()
+        result = await self.client.log_out()
+        self._invalidate_auth(False)
+        return result
 
-    def on(self, event):
+    def add_group(self, name, workers=4, max_queue=1000, overflow='block'):
+        """
+        创建事件处理组，on(event, group=name) 注册的处理器经由该组的有界队列和工作协程执行
+        
+        Args:
+            name: 组名
+            workers: 工作协程数
+            max_queue: 排队事件数上限
+            overflow: 队列满时的策略：'block'、'drop' 或 'shed_oldest'；
+                'block' 需要以 sequential_updates=True 创建客户端才能限制内存
+            
+        Returns:
+            HandlerGroup 对象
+        """
+        if overflow == 'block' and not self.sequential_updates:
+            Logger().warning(
+                "事件处理组 %s 使用 'block' 策略但客户端未启用 sequential_updates，"
+                "排队等待的更新数不受 max_queue 限制", name)
+        group = HandlerGroup(name, workers=workers, max_queue=max_queue, overflow=overflow)
+        self._groups[name] = group
+        return group
+
+    def dispatch_stats(self):
+        """
+        获取各事件处理组的运行指标
+        
+        Returns:
+            dict: {组名: 指标字典}
+        """
+        return {name: group.stats() for name, group in self._groups.items()}
+
+    def on(self, event, group=None):
         """
         事件装饰器
         
         Args:
             event: 事件类型
+            group: 事件处理组名称，None 表示由 Telethon 直接调用处理器
         """
-        return self.client.on(event)
+        if group is None:
+            return self.client.on(event)
+        if group not in self._groups:
+            raise ValueError(f"事件处理组不存在: {group}")
+        handler_group = self._groups[group]
+        
+        def decorator(handler):
+            self.client.add_event_handler(handler_group.wrap(handler), event)
+            return handler
+        return decorator
 
     async def run_until_disconnected(self):
         """运行直到断开连接"""
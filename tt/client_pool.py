@@ -0,0 +1,339 @@
+import asyncio
+import time
+from collections import OrderedDict
+from pathlib import Path
+from telethon import errors
+from .broadcast import broadcast
+from .client import AUTH_ERRORS, TGClient
+from .entity_cache import EntityCache
+from .log import Logger
+from .sender import _chat_key
+from .session import DBSession
+
+
+class Account:
+    """连接池中的账号及其健康状态"""
+
+    def __init__(self, name, client):
+        """
+        初始化账号
+
+        Args:
+            name: 账号名称（会话名）
+            client: TGClient 对象
+        """
+        self.name = name
+        self.client = client
+        self.healthy = False
+        self.error = None
+        self.last_used = 0.0
+        self.flood_until = 0.0
+        self.flood_penalty = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def available(self):
+        """当前是否可以发送"""
+        return self.healthy and self.flood_until <= time.monotonic()
+
+    def to_dict(self):
+        """账号状态"""
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'available': self.available,
+            'error': self.error,
+            'flood_wait': max(0.0, self.flood_until - time.monotonic()),
+            'flood_penalty': self.flood_penalty,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+
+class TGClientPool:
+    """多账号客户端池：并发启动账号，按策略选择账号发送消息"""
+
+    POLICIES = ('lru', 'flood', 'sticky')
+
+    def __init__(self, api_id, api_hash, proxy=None, concurrency=10, policy='lru',
+                 connect_timeout=30, penalty_half_life=3600, entity_cache=None, throttle=None,
+                 max_sticky=100000, logger=None):
+        """
+        初始化客户端池
+
+        Args:
+            api_id: Telegram API ID
+            api_hash: Telegram API Hash
+            proxy: 代理设置
+            concurrency: 启动时同时连接的账号数
+            policy: 选择账号的策略：'lru' 最久未使用、'flood' 限流惩罚最低、
+                'sticky' 同一个聊天固定使用同一账号
+            connect_timeout: 单个账号连接和检查授权的超时秒数
+            penalty_half_life: 限流惩罚的半衰期（秒）
+            entity_cache: 每个账号的实体解析缓存设置（True、EntityCache 参数字典或 EntityCache 对象），
+                各账号的 access_hash 不通用，因此每个账号创建独立的缓存；传入 EntityCache 对象时
+                按其 max_entries、ttl 和 store 为每个账号新建缓存，共用同一个存储
+            throttle: 所有账号共享的媒体传输限速 TransferThrottle
+            max_sticky: 'sticky' 策略最多记住的聊天数，超过时淘汰最久未使用的
+            logger: 日志记录器
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的账号选择策略: {policy}")
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.proxy = proxy
+        self.concurrency = concurrency
+        self.policy = policy
+        self.connect_timeout = connect_timeout
+        self.penalty_half_life = penalty_half_life
+        self.entity_cache = entity_cache
+        self.throttle = throttle
+        self.max_sticky = max_sticky
+        self.logger = logger or Logger()
+        self._accounts = {}
+        self._sticky = OrderedDict()
+        self._decayed_at = time.monotonic()
+
+    def add(self, session_name, client=None, session=None):
+        """
+        添加账号
+
+        池内的客户端不由 Telethon 自动等待 FloodWait（flood_sleep_threshold=0），
+        限流直接抛出，由连接池记录惩罚并换账号发送。
+
+        Args:
+            session_name: 会话名称
+            client: 已创建的 TGClient，为 None 时按会话名创建
+            session: 创建客户端时使用的 Telethon 会话对象（如 DBSession），None 使用会话文件
+
+        Returns:
+            Account 对象
+        """
+        if client is None:
+            entity_cache = self.entity_cache
+            if isinstance(entity_cache, EntityCache):
+                entity_cache = EntityCache(
+                    max_entries=entity_cache.max_entries, ttl=entity_cache.ttl, store=entity_cache.store,
+                    account=str(session_name),
+                )
+            client = TGClient(
+                session if session is not None else session_name, self.api_id, self.api_hash,
+                proxy=self.proxy, entity_cache=entity_cache, throttle=self.throttle, flood_sleep_threshold=0,
+            )
+        else:
+            client.client.flood_sleep_threshold = 0
+        account = Account(str(session_name), client)
+        self._accounts[account.name] = account
+        return account
+
+    def load(self, session_dir, pattern='*.session'):
+        """
+        加载目录下的所有会话文件
+
+        Args:
+            session_dir: 会话文件目录
+            pattern: 文件名匹配模式
+
+        Returns:
+            int: 新加载的账号数
+        """
+        count = 0
+        for path in sorted(Path(session_dir).glob(pattern)):
+            # Telethon 的会话名不含 .session 后缀
+            name = str(path.with_suffix('')) if path.suffix == '.session' else str(path)
+            if name not in self._accounts:
+                self.add(name)
+                count += 1
+        return count
+
+    def load_db(self, db, prefix='tt_session'):
+        """
+        加载数据库中保存的所有会话（DBSession），任何节点都可以接管这些账号
+
+        Args:
+            db: DB 对象
+            prefix: 会话表名前缀
+
+        Returns:
+            int: 新加载的账号数
+        """
+        count = 0
+        for name in DBSession.list_names(db, prefix):
+            if name not in self._accounts:
+                self.add(name, session=DBSession(db, name, prefix=prefix))
+                count += 1
+        return count
+
+    @property
+    def accounts(self):
+        """所有账号"""
+        return list(self._accounts.values())
+
+    def get(self, name):
+        """
+        按名称获取账号
+
+        Args:
+            name: 账号名称
+
+        Returns:
+            Account 对象，不存在返回 None
+        """
+        return self._accounts.get(name)
+
+    def __len__(self):
+        """返回账号数量"""
+        return len(self._accounts)
+
+    async def start(self):
+        """
+        并发连接所有账号并检查授权，未授权或连接失败的账号标记为不可用
+
+        Returns:
+            int: 可用账号数
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def start_one(account):
+            async with semaphore:
+                try:
+                    account.healthy = await asyncio.wait_for(
+                        account.client.is_auth(), self.connect_timeout
+                    )
+                    account.error = None if account.healthy else '未授权'
+                except Exception as e:
+                    account.healthy = False
+                    account.error = str(e) or type(e).__name__
+
+        started = time.monotonic()
+        await asyncio.gather(*(start_one(a) for a in self._accounts.values()))
+        healthy = sum(1 for a in self._accounts.values() if a.healthy)
+        self.logger.info("账号池启动完成: %d/%d 可用，耗时 %.1f 秒",
+                         healthy, len(self._accounts), time.monotonic() - started)
+        return healthy
+
+    async def disconnect(self):
+        """断开所有账号"""
+        await asyncio.gather(
+            *(a.client.disconnect() for a in self._accounts.values()), return_exceptions=True
+        )
+
+    def choose(self, entity=None, policy=None):
+        """
+        按策略选择一个可用账号
+
+        Args:
+            entity: 目标实体，'sticky' 策略使用
+            policy: 本次使用的策略，None 使用默认策略
+
+        Returns:
+            Account 对象，没有可用账号时返回 None
+        """
+        policy = policy or self.policy
+        candidates = [a for a in self._accounts.values() if a.available]
+        if not candidates:
+            return None
+        if policy == 'sticky' and entity is not None:
+            key = _chat_key(entity)
+            account = self._accounts.get(self._sticky.get(key))
+            if account is None or not account.available:
+                account = min(candidates, key=lambda a: a.last_used)
+                self._sticky[key] = account.name
+                while len(self._sticky) > self.max_sticky:
+                    self._sticky.popitem(last=False)
+            self._sticky.move_to_end(key)
+            return account
+        if policy == 'flood':
+            self._decay_penalties()
+            return min(candidates, key=lambda a: (a.flood_penalty, a.last_used))
+        return min(candidates, key=lambda a: a.last_used)
+
+    async def send_message(self, entity, message, policy=None, retries=3, **kwargs):
+        """
+        选择账号发送消息，遇到限流时换账号重试
+
+        entity 应为用户名、手机号或 ID：实体对象的 access_hash 属于获取它的账号，不能跨账号使用。
+
+        Args:
+            entity: 目标实体
+            message: 消息内容
+            policy: 本次使用的选择策略
+            retries: 限流或账号失效时最多换账号的次数
+            **kwargs: 传给 Telethon send_message 的其他参数
+
+        Returns:
+            发送的消息对象
+
+        Raises:
+            RuntimeError: 没有可用账号
+        """
+        last_error = None
+        for _ in range(retries + 1):
+            account = self.choose(entity, policy)
+            if account is None:
+                break
+            account.last_used = time.monotonic()
+            try:
+                result = await account.client.send_message(entity, message, **kwargs)
+            except errors.FloodWaitError as e:
+                self.penalize(account, e.seconds)
+                last_error = e
+                continue
+            except AUTH_ERRORS as e:
+                account.healthy = False
+                account.error = type(e).__name__
+                account.failed += 1
+                self.logger.warning("账号 %s 已失效: %s", account.name, e)
+                last_error = e
+                continue
+            except Exception:
+                account.failed += 1
+                raise
+            account.sent += 1
+            return result
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("没有可用的账号")
+
+    async def broadcast(self, entities, message, concurrency=10, **kwargs):
+        """
+        使用池中账号群发消息，参数见 tt.broadcast.broadcast()
+
+        Returns:
+            BroadcastResult 对象
+        """
+        return await broadcast(self, entities, message, concurrency=concurrency, **kwargs)
+
+    def penalize(self, account, seconds):
+        """
+        记录账号被限流
+
+        Args:
+            account: Account 对象
+            seconds: FloodWait 秒数
+        """
+        self._decay_penalties()
+        account.flood_until = max(account.flood_until, time.monotonic() + seconds)
+        account.flood_penalty += seconds
+        self.logger.warning("账号 %s 被限流 %s 秒", account.name, seconds)
+
+    def health(self):
+        """
+        获取所有账号状态
+
+        Returns:
+            list: 每个账号的状态字典
+        """
+        return [a.to_dict() for a in self._accounts.values()]
+
+    def _decay_penalties(self):
+        """按半衰期衰减所有账号的限流惩罚"""
+        now = time.monotonic()
+        elapsed = now - self._decayed_at
+        if elapsed < 1 or not self.penalty_half_life:
+            return
+        factor = 0.5 ** (elapsed / self.penalty_half_life)
+        for account in self._accounts.values():
+            account.flood_penalty *= factor
+        self._decayed_at = now
@@ -1,6 +1,5 @@
 import yaml
 import argparse
-import socks
 from pathlib import Path
 
 
@@ -98,6 +97,9 @@ class Config:
         if not use_proxy:
             return None
         
+        # 仅在启用代理时导入 socks
+        import socks
+        
         proxy_type = self.get('proxy.type', 'http').lower()
         host = self.get('proxy.host', '127.0.0.1')
         port = self.get('proxy.port', 7890)
@@ -1,53 +1,228 @@
+import itertools
+import threading
+import time
 import pymysql
+from collections import namedtuple
 from contextlib import contextmanager
+from .cache import MISS, QueryCache, read_tables, write_tables
+from .pool import ConnectionPool
+from .replica import Replica, ReplicaSet
+from .stats import QueryStats
+from . import rows as row_formats
+
+
+# bulk_insert 的返回值：影响行数、插入的自增 ID 区间 [(首个, 末个)]、执行的语句数
+BulkResult = namedtuple('BulkResult', ['rowcount', 'id_ranges', 'statements'])
+
+# 单条批量插入语句的默认字节上限（同时受服务器 max_allowed_packet 限制）
+BULK_MAX_BYTES = 8 * 1024 * 1024
+
+# 表示连接不可用的 MySQL 错误码（连接过多、服务器关闭、无法连接、连接断开）
+_CONNECTION_ERRORS = {1040, 1053, 2003, 2006, 2013, 2055}
 
 
 class DB:
-    """数据库操作类，支持上下文管理器和单例模式"""
-    
-    def __init__(self, db_name, pwd, host='127.0.0.1', port=3306, user='root'):
+    """数据库操作类，支持上下文管理器、单例模式和连接池模式"""
+
+    def __init__(self, db_name, pwd, host='127.0.0.1', port=3306, user='root', pool=None,
+                 auto_commit=True, cache=None, stats=None, replicas=None,
+                 replica_policy='round_robin', read_your_writes=0):
+        """
+        初始化数据库
+
+        Args:
+            db_name: 数据库名称
+            pwd: 数据库密码
+            host: 数据库主机
+            port: 数据库端口
+            user: 数据库用户
+            pool: 连接池配置，为 None 时使用单连接；为 True 或字典时启用连接池，
+                字典参数见 ConnectionPool（min_size、max_size、idle_timeout、recycle、timeout）
+            auto_commit: 写操作后是否自动提交；为 False 时需调用 commit()，
+                连接池模式下仅在 with db / db.connection() 块内生效
+            cache: 查询缓存，为 None 时不缓存；可传入 QueryCache 对象，或 True / 字典
+                （字典参数见 QueryCache：ttl、max_entries、max_bytes）
+            stats: SQL 执行统计，为 None 时不统计；可传入 QueryStats 对象，或 True / 字典
+                （字典参数见 QueryStats：slow_threshold、logger、max_statements）
+            replicas: 从库列表，每项为 'host:port' 字符串或字典
+                （host、port、user、password、name，未给出的项与主库相同）；
+                query / query_one / iter_query 读从库，写操作、事务和固定连接内的调用走主库
+            replica_policy: 从库选择策略，'round_robin' 或 'least_latency'
+            read_your_writes: 写操作后此秒数内的读取都走主库，保证读到刚写入的数据
+        """
         self.db_name = db_name
         self.pwd = pwd
         self.host = host
         self.port = port
         self.user = user
+        self.auto_commit = auto_commit
+        self.read_your_writes = read_your_writes
         self.connect = None
         self.cursor = None
         self._is_connected = False
+        self._local = threading.local()
+        self._pool = None
+        self._max_allowed_packet = None
+        self._last_write = 0.0
+        self._replicas = None
+        # close() 后从库连接池处于关闭状态，下次读取时重新启用
+        self._replicas_closed = False
+        # 单连接模式下异步组件（导出、写缓冲等）调用本对象的专用单线程池，见 async_db._call_db
+        self._serial_executor = None
+        if cache is None or cache is False or isinstance(cache, QueryCache):
+            self._cache = cache or None
+        else:
+            self._cache = QueryCache(**(cache if isinstance(cache, dict) else {}))
+        if stats is None or stats is False or isinstance(stats, QueryStats):
+            self._stats = stats or None
+        else:
+            self._stats = QueryStats(**(stats if isinstance(stats, dict) else {}))
+        if pool:
+            options = pool if isinstance(pool, dict) else {}
+            # 连接池中的连接开启服务端自动提交，单条写入无需额外的 COMMIT 往返，
+            # 归还时也不会残留只读事务的快照
+            kwargs = self._connect_kwargs()
+            kwargs['autocommit'] = auto_commit
+            self._pool = ConnectionPool(kwargs, stats=self._stats, **options)
+        if replicas:
+            options = pool if isinstance(pool, dict) else {}
+            self._replicas = ReplicaSet(
+                [self._make_replica(endpoint, options) for endpoint in replicas],
+                policy=replica_policy,
+            )
+
+    @classmethod
+    def from_config(cls, config, section='database'):
+        """
+        根据 Config 中的数据库配置创建 DB
+
+        Args:
+            config: Config 对象
+            section: 配置段名称
+
+        Returns:
+            DB 对象
+        """
+        return cls(**cls._config_kwargs(config, section))
+
+    @staticmethod
+    def _config_kwargs(config, section):
+        """从配置段读取构造参数"""
+        def get(key, default=None):
+            return config.get(f"{section}.{key}", default)
+
+        return dict(
+            db_name=get('name'),
+            pwd=get('password'),
+            host=get('host', '127.0.0.1'),
+            port=get('port', 3306),
+            user=get('user', 'root'),
+            pool=get('pool'),
+            auto_commit=get('auto_commit', True),
+            cache=get('cache'),
+            stats=get('stats'),
+            replicas=get('replicas'),
+            replica_policy=get('replica_policy', 'round_robin'),
+            read_your_writes=get('read_your_writes', 0),
+        )
+
+    def _make_replica(self, endpoint, options):
+        """根据从库配置创建节点，从库总是使用连接池"""
+        if isinstance(endpoint, str):
+            host, _, port = endpoint.partition(':')
+            endpoint = {'host': host, 'port': int(port) if port else self.port}
+        kwargs = self._connect_kwargs()
+        kwargs.update(
+            host=endpoint.get('host', self.host),
+            port=endpoint.get('port', self.port),
+            user=endpoint.get('user', self.user),
+            passwd=endpoint.get('password', self.pwd),
+            db=endpoint.get('name', self.db_name),
+            autocommit=True,
+        )
+        pool = ConnectionPool(kwargs, stats=self._stats, **options)
+        return Replica(f"{kwargs['host']}:{kwargs['port']}", pool)
 
     def __enter__(self):
-        """进入上下文管理器时自动连接"""
-        self.conn()
+        """进入上下文管理器时自动连接（连接池模式下为当前线程借出一个连接）"""
+        if self._pool is not None:
+            self._pin()
+        else:
+            self.conn()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """退出上下文管理器时自动关闭连接"""
-        self.close()
+        """退出上下文管理器时自动关闭连接（连接池模式下归还连接）"""
+        if self._pool is not None:
+            self._unpin(discard=self._is_broken(exc_val))
+        else:
+            self.close()
         return False
 
+    @property
+    def pool(self):
+        """连接池对象，单连接模式下为 None"""
+        return self._pool
+
+    @property
+    def cache(self):
+        """查询缓存对象，未启用时为 None"""
+        return self._cache
+
+    @property
+    def stats(self):
+        """SQL 执行统计对象，未启用时为 None"""
+        return self._stats
+
+    @property
+    def replicas(self):
+        """从库集合 ReplicaSet，未配置时为 None"""
+        return self._replicas
+
+    def _connect_kwargs(self):
+        """pymysql.connect 参数"""
+        return dict(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            passwd=self.pwd,
+            db=self.db_name,
+            charset='utf8mb4'
+        )
+
     def conn(self):
-        """建立数据库连接"""
+        """建立数据库连接（连接池模式下预建最少连接数）"""
+        if self._pool is not None:
+            self._pool.open()
+            return
+
         if self._is_connected and self.connect:
             # 检查连接是否仍然有效
+            start = time.perf_counter()
             try:
                 self.connect.ping(reconnect=True)
                 return
             except:
                 pass
-        
-        self.connect = pymysql.connect(
-            host=self.host,
-            port=self.port,
-            user=self.user,
-            passwd=self.pwd,
-            db=self.db_name,
-            charset='utf8mb4'
-        )
+            finally:
+                if self._stats is not None:
+                    self._stats.record_connect(time.perf_counter() - start, 'ping')
+
+        start = time.perf_counter()
+        self.connect = pymysql.connect(**self._connect_kwargs())
+        if self._stats is not None:
+            self._stats.record_connect(time.perf_counter() - start)
         self.cursor = self.connect.cursor(pymysql.cursors.DictCursor)
         self._is_connected = True
 
     def close(self):
         """关闭数据库连接"""
+        if self._replicas is not None:
+            self._replicas.close()
+            self._replicas_closed = True
+        if self._pool is not None:
+            self._pool.close()
+            return
         if self.cursor:
             self.cursor.close()
         if self.connect:
@@ -56,53 +231,555 @@ class DB:
 
     def ensure_connected(self):
         """确保数据库已连接"""
+        if self._pool is not None:
+            return
         if not self._is_connected:
             self.conn()
 
-    def query(self, sql, params=None):
-        """查询数据"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        return self.cursor.fetchall()
+    @contextmanager
+    def connection(self):
+        """
+        在 with 块内固定使用同一个连接
+
+        连接池模式下为当前线程借出一个连接，块内的所有调用共用它；
+        单连接模式下直接返回该连接。
+
+        Yields:
+            pymysql 连接对象
+        """
+        if self._pool is None:
+            self.ensure_connected()
+            yield self.connect
+            return
+        conn = self._pin()
+        try:
+            yield conn
+        except BaseException as e:
+            self._unpin(discard=self._is_broken(e))
+            raise
+        else:
+            self._unpin()
+
+    def _pin(self):
+        """为当前线程固定一个连接，支持嵌套"""
+        local = self._local
+        if getattr(local, 'depth', 0):
+            local.depth += 1
+            return local.conn
+        local.conn = self._pool.acquire()
+        local.depth = 1
+        return local.conn
+
+    def _unpin(self, discard=False):
+        """释放当前线程固定的连接"""
+        local = self._local
+        local.depth -= 1
+        if local.depth == 0:
+            conn, local.conn = local.conn, None
+            self._pool.release(conn, discard=discard)
+
+    @staticmethod
+    def _is_broken(exc):
+        """异常是否意味着连接已不可用"""
+        return isinstance(exc, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
+
+    @contextmanager
+    def _borrow(self, replica=None):
+        """借用本次调用使用的连接，指定 replica 时从该从库借用"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        pool = self._pool if replica is None else replica.pool
+        if pool is None:
+            self.ensure_connected()
+            yield self.connect
+            return
+        conn = pool.acquire()
+        try:
+            yield conn
+        except BaseException as e:
+            pool.release(conn, discard=self._is_broken(e))
+            raise
+        else:
+            pool.release(conn)
+
+    def _execute(self, sql, params, result, commit=False, many=False, raw=False, row_format='dict',
+                 label=None, replica=None):
+        """
+        在借用的连接上执行 SQL
+
+        Args:
+            sql: SQL 语句
+            params: 参数（many 为 True 时为参数列表）
+            result: 从游标提取返回值的函数
+            commit: 执行后是否提交
+            many: 是否使用 executemany
+            raw: SQL 已完成转义，不再做参数替换
+            row_format: 行格式，见 tt.rows.ROW_FORMATS
+            label: 统计时使用的语句模板，为 None 时由 sql 归一化得到
+            replica: 在该从库上执行，None 表示主库
+        """
+        stats = self._stats
+        if commit:
+            self._last_write = time.monotonic()
+        with self._borrow(replica) as connect:
+            with connect.cursor(row_formats.cursor_class(row_format)) as cursor:
+                start = time.perf_counter()
+                try:
+                    if many:
+                        cursor.executemany(sql, params)
+                    elif raw:
+                        cursor.execute(sql)
+                    else:
+                        cursor.execute(sql, params or ())
+                    if commit and self._autocommits() and not connect.get_autocommit():
+                        connect.commit()
+                except Exception:
+                    if stats is not None:
+                        stats.record(sql, time.perf_counter() - start, error=True, label=label)
+                    raise
+                if stats is not None:
+                    stats.record(sql, time.perf_counter() - start, cursor.rowcount, label=label)
+                value = result(cursor)
+                if row_format != 'dict':
+                    if result is _fetchone:
+                        value = row_formats.convert_one(value, cursor.description, row_format)
+                    else:
+                        value = row_formats.convert(value, cursor.description, row_format)
+        if commit and self._cache is not None:
+            self._invalidate(sql)
+        return value
+
+    def _read(self, sql, params, result, cache_ttl, row_format):
+        """执行查询，启用缓存时先查缓存"""
+        key = self._cache_key(sql, params, result, cache_ttl, row_format)
+        if key is None:
+            return self._execute_read(sql, params, result, row_format)
+        cache = self._cache
+        value = cache.get(key)
+        if value is not MISS:
+            return value
+        tables = read_tables(sql)
+        version = cache.version(tables)
+        value = self._execute_read(sql, params, result, row_format)
+        cache.set(key, value, tables, ttl=cache_ttl, version=version)
+        return value
+
+    def _execute_read(self, sql, params, result, row_format):
+        """
+        执行读取，可用时走从库
+
+        从库连接失败时标记故障并改用主库；从库连接池借用超时只说明从库繁忙，
+        本次改用主库但不标记故障，避免负载全部转移到主库
+        """
+        replica = self._choose_replica()
+        if replica is None:
+            return self._execute(sql, params, result, row_format=row_format)
+        start = time.perf_counter()
+        try:
+            value = self._execute(sql, params, result, row_format=row_format, replica=replica)
+        except TimeoutError:
+            return self._execute(sql, params, result, row_format=row_format)
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+            if isinstance(e, pymysql.err.OperationalError) and e.args and e.args[0] not in _CONNECTION_ERRORS:
+                raise
+            self._replicas.mark_down(replica)
+            return self._execute(sql, params, result, row_format=row_format)
+        self._replicas.observe(replica, time.perf_counter() - start)
+        return value
+
+    def _choose_replica(self):
+        """选择本次读取使用的从库，需要走主库时返回 None"""
+        if self._replicas is None:
+            return None
+        local = self._local
+        if getattr(local, 'conn', None) is not None or getattr(local, 'tx_depth', 0):
+            return None
+        if self.read_your_writes and time.monotonic() - self._last_write < self.read_your_writes:
+            return None
+        if self._replicas_closed:
+            # 与主库一样，close() 之后仍可继续使用
+            self._replicas_closed = False
+            self._replicas.reopen()
+        return self._replicas.choose()
 
-    def query_one(self, sql, params=None):
-        """查询单条数据"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        return self.cursor.fetchone()
+    def _cache_key(self, sql, params, result, cache_ttl, row_format):
+        """本次查询可使用缓存时返回缓存键，否则返回 None"""
+        # 事务或未提交会话中读到的数据可能尚未提交，不走缓存
+        if self._cache is None or cache_ttl == 0 or not self._autocommits():
+            return None
+        return self._cache.make_key(sql, params, (result.__name__, row_format))
+
+    def _cached(self, sql, params, result, cache_ttl, row_format='dict'):
+        """只查缓存，不访问数据库；未命中返回 MISS"""
+        key = self._cache_key(sql, params, result, cache_ttl, row_format)
+        return MISS if key is None else self._cache.get(key, count_miss=False)
+
+    def _invalidate(self, sql):
+        """写操作后使相关表的缓存失效"""
+        tables = write_tables(sql)
+        if tables is not None and not tables:
+            return
+        self._cache.invalidate(tables)
+        if not self._autocommits():
+            # 提交前其他线程可能又缓存了旧数据，提交或回滚时再失效一次
+            local = self._local
+            dirty = getattr(local, 'dirty_tables', set())
+            local.dirty_tables = None if tables is None or dirty is None else dirty | tables
+
+    def _invalidate_dirty(self):
+        """提交或回滚后再次失效本会话修改过的表"""
+        local = self._local
+        if self._cache is None or not hasattr(local, 'dirty_tables'):
+            return
+        tables = local.dirty_tables
+        del local.dirty_tables
+        self._cache.invalidate(tables)
+
+    def _autocommits(self):
+        """当前调用是否应在写操作后提交"""
+        local = self._local
+        if getattr(local, 'tx_depth', 0):
+            return False
+        if self.auto_commit:
+            return True
+        # 连接池模式下未固定连接时，没有会话可以保留未提交的修改
+        return self._pool is not None and getattr(local, 'conn', None) is None
+
+    @contextmanager
+    def transaction(self):
+        """
+        显式事务，块内的写操作不再逐条提交，正常退出时提交一次，异常时回滚
+
+        嵌套调用使用 SAVEPOINT，内层异常只回滚到内层开始处。
+        连接池模式下事务期间为当前线程固定同一个连接。
+
+        Yields:
+            当前 DB 对象
+        """
+        with self.connection() as connect:
+            local = self._local
+            depth = getattr(local, 'tx_depth', 0)
+            savepoint = f"tt_sp_{depth}"
+            if depth == 0:
+                connect.begin()
+            else:
+                self._run_plain(connect, f"SAVEPOINT {savepoint}")
+            local.tx_depth = depth + 1
+            try:
+                yield self
+            except BaseException:
+                local.tx_depth = depth
+                try:
+                    if depth == 0:
+                        connect.rollback()
+                    else:
+                        self._run_plain(connect, f"ROLLBACK TO SAVEPOINT {savepoint}")
+                except Exception:
+                    # 回滚失败通常说明连接已断开，保留原始异常
+                    pass
+                if depth == 0:
+                    self._invalidate_dirty()
+                raise
+            local.tx_depth = depth
+            if depth == 0:
+                try:
+                    connect.commit()
+                finally:
+                    self._invalidate_dirty()
+            else:
+                self._run_plain(connect, f"RELEASE SAVEPOINT {savepoint}")
+
+    @staticmethod
+    def _run_plain(connect, sql):
+        """执行无参数、无结果的语句"""
+        with connect.cursor() as cursor:
+            cursor.execute(sql)
+
+    def commit(self):
+        """提交当前连接上的修改（用于 auto_commit=False）"""
+        with self._borrow() as connect:
+            connect.commit()
+        self._invalidate_dirty()
+
+    def rollback(self):
+        """回滚当前连接上的修改（用于 auto_commit=False）"""
+        with self._borrow() as connect:
+            connect.rollback()
+        self._invalidate_dirty()
+
+    def query(self, sql, params=None, cache_ttl=None, row_format='dict'):
+        """
+        查询数据
+
+        Args:
+            sql: SQL 语句
+            params: 参数
+            cache_ttl: 启用查询缓存时本次结果的缓存秒数，None 使用缓存默认值，0 表示不使用缓存
+            row_format: 行格式：'dict'、'tuple'、'record'（namedtuple）、
+                'columns'（{列名: 列表}）或 'arrays'（数值列使用 array）
+        """
+        return self._read(sql, params, _fetchall, cache_ttl, row_format)
+
+    def query_one(self, sql, params=None, cache_ttl=None, row_format='dict'):
+        """
+        查询单条数据
+
+        Args:
+            sql: SQL 语句
+            params: 参数
+            cache_ttl: 启用查询缓存时本次结果的缓存秒数，None 使用缓存默认值，0 表示不使用缓存
+            row_format: 行格式：'dict'、'tuple' 或 'record'
+        """
+        if row_format in row_formats.COLUMNAR_FORMATS:
+            raise ValueError(f"单行查询不支持列式格式: {row_format}")
+        return self._read(sql, params, _fetchone, cache_ttl, row_format)
+
+    def iter_query(self, sql, params=None, batch_size=1000, batches=False, row_format='dict'):
+        """
+        流式查询，使用无缓冲游标逐批读取结果，适合扫描大表
+
+        迭代期间占用一个连接：单连接模式或 with 块内请勿在迭代中执行其他查询。
+        提前停止迭代时，未固定的连接会被直接关闭，避免读完剩余结果；
+        事务中（或单连接模式下有未提交的修改时）则读完剩余结果，保留连接和事务。
+
+        Args:
+            sql: SQL 语句
+            params: 参数
+            batch_size: 每次从服务器读取的行数
+            batches: 为 True 时按批产出行列表，否则逐行产出
+            row_format: 行格式，见 query；列式格式只能与 batches=True 一起使用
+
+        Yields:
+            行或行列表（列式格式时为每批的列式字典）
+        """
+        if row_format in row_formats.COLUMNAR_FORMATS and not batches:
+            raise ValueError("列式格式需要 batches=True")
+        cursor_cls = row_formats.cursor_class(row_format, unbuffered=True)
+        pinned = getattr(self._local, 'conn', None)
+        replica = self._choose_replica()
+        pool = self._pool if replica is None else replica.pool
+        # 事务或未提交的修改所在的连接不能关闭，提前停止时只能读完剩余结果
+        keep = pinned is not None or (pool is None and not self._autocommits())
+        if pinned is not None:
+            connect = pinned
+        elif pool is not None:
+            connect = pool.acquire()
+        else:
+            self.ensure_connected()
+            connect = self.connect
+
+        cursor = connect.cursor(cursor_cls)
+        finished = False
+        failed = False
+        fetched = 0
+        elapsed = 0.0
+        try:
+            start = time.perf_counter()
+            cursor.execute(sql, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                fetched += len(rows)
+                if row_format != 'dict':
+                    rows = row_formats.convert(rows, cursor.description, row_format)
+                if batches:
+                    yield rows
+                else:
+                    yield from rows
+                start = time.perf_counter()
+            finished = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if self._stats is not None:
+                # 只统计数据库读取耗时，不含调用方处理每批数据的时间
+                self._stats.record(sql, elapsed, fetched, error=failed)
+            if finished or keep:
+                # 固定的连接还要继续使用，只能读完剩余结果
+                cursor.close()
+            if not keep:
+                if pool is not None:
+                    pool.release(connect, discard=not finished)
+                elif not finished:
+                    self._is_connected = False
+                    try:
+                        connect.close()
+                    except Exception:
+                        pass
 
     def insert(self, sql, params=None):
         """插入数据"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        self.connect.commit()
-        return self.cursor.lastrowid
+        return self._execute(sql, params, _lastrowid, commit=True)
+
+    def bulk_insert(self, table, rows, columns=None, on_duplicate=None, ignore=False,
+                    max_rows=5000, max_bytes=BULK_MAX_BYTES):
+        """
+        多行批量插入，生成 INSERT ... VALUES (...),(...) 语句并按包大小自动分块
+
+        每个分块按当前提交规则单独提交，需要整体原子性时放在 transaction() 内。
+
+        Args:
+            table: 表名
+            rows: 由字典或序列组成的可迭代对象
+            columns: 列名列表；为 None 时取第一行字典的键
+            on_duplicate: 唯一键冲突时的处理（ON DUPLICATE KEY UPDATE）：
+                True 更新全部列；列名列表更新指定列；
+                字典为 {列名: SQL 表达式}；字符串原样拼接
+            ignore: 是否使用 INSERT IGNORE
+            max_rows: 单条语句最多包含的行数
+            max_bytes: 单条语句的字节上限，实际上限不超过服务器 max_allowed_packet
+
+        Returns:
+            BulkResult(rowcount, id_ranges, statements)；id_ranges 仅在普通插入且表有自增列时
+            给出，依赖同一语句内自增 ID 连续分配（innodb_autoinc_lock_mode 为 0 或 1）
+        """
+        it = iter(rows)
+        first = next(it, None)
+        if first is None:
+            return BulkResult(0, [], 0)
+        if columns is None:
+            if not isinstance(first, dict):
+                raise ValueError("行不是字典时必须指定 columns")
+            columns = list(first)
+
+        prefix = "INSERT {}INTO {} ({}) VALUES ".format(
+            'IGNORE ' if ignore else '',
+            _quote_name(table),
+            ', '.join(_quote_name(c) for c in columns),
+        )
+        suffix = self._on_duplicate_clause(columns, on_duplicate)
+        track_ids = not ignore and not suffix
+        label = prefix + '(...)' + suffix
+
+        rowcount = 0
+        id_ranges = []
+        statements = 0
+        with self.connection() as connect:
+            budget = min(max_bytes, self._max_packet()) - _byte_len(prefix) - _byte_len(suffix) - 1024
+            chunks = self._bulk_chunks(connect, itertools.chain((first,), it), columns, budget, max_rows)
+            for values in chunks:
+                count, first_id = self._execute(prefix + values + suffix, None, _rowcount_lastrowid,
+                                                commit=True, raw=True, label=label)
+                rowcount += count
+                statements += 1
+                if track_ids and first_id and count:
+                    id_ranges.append((first_id, first_id + count - 1))
+        return BulkResult(rowcount, id_ranges, statements)
+
+    def bulk_upsert(self, table, rows, update=True, columns=None, max_rows=5000,
+                    max_bytes=BULK_MAX_BYTES):
+        """
+        批量插入或更新（INSERT ... ON DUPLICATE KEY UPDATE），见 bulk_insert
+
+        Args:
+            table: 表名
+            rows: 由字典或序列组成的可迭代对象
+            update: 冲突时更新的列，True 为全部列，也可为列名列表或 {列名: SQL 表达式}
+            columns: 列名列表
+            max_rows: 单条语句最多包含的行数
+            max_bytes: 单条语句的字节上限
+
+        Returns:
+            BulkResult；rowcount 遵循 MySQL 约定（插入计 1，更新计 2）
+        """
+        return self.bulk_insert(table, rows, columns=columns, on_duplicate=update,
+                                max_rows=max_rows, max_bytes=max_bytes)
+
+    @staticmethod
+    def _bulk_chunks(connect, rows, columns, budget, max_rows):
+        """
+        将行转义为 VALUES 列表并按字节预算和行数分块
+
+        Yields:
+            形如 (...),(...) 的字符串
+        """
+        chunk = []
+        size = 0
+        for row in rows:
+            if isinstance(row, dict):
+                row = tuple(row[c] for c in columns)
+            literal = connect.escape(tuple(row))
+            n = _byte_len(literal) + 1
+            if chunk and (size + n > budget or len(chunk) >= max_rows):
+                yield ','.join(chunk)
+                chunk = []
+                size = 0
+            chunk.append(literal)
+            size += n
+        if chunk:
+            yield ','.join(chunk)
+
+    @staticmethod
+    def _on_duplicate_clause(columns, on_duplicate):
+        """生成 ON DUPLICATE KEY UPDATE 子句"""
+        if not on_duplicate:
+            return ''
+        if on_duplicate is True:
+            on_duplicate = columns
+        if isinstance(on_duplicate, str):
+            assignments = on_duplicate
+        elif isinstance(on_duplicate, dict):
+            assignments = ', '.join(f"{_quote_name(c)} = {expr}" for c, expr in on_duplicate.items())
+        else:
+            assignments = ', '.join(
+                "{0} = VALUES({0})".format(_quote_name(c)) for c in on_duplicate
+            )
+        return ' ON DUPLICATE KEY UPDATE ' + assignments
+
+    def _max_packet(self):
+        """服务器的 max_allowed_packet（首次查询后缓存）"""
+        if self._max_allowed_packet is None:
+            row = self.query_one("SELECT @@max_allowed_packet AS max_packet")
+            self._max_allowed_packet = int(row['max_packet'])
+        return self._max_allowed_packet
 
     def update(self, sql, params=None):
         """更新数据"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        self.connect.commit()
-        return self.cursor.rowcount
+        return self._execute(sql, params, _rowcount, commit=True)
 
     def delete(self, sql, params=None):
         """删除数据"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        self.connect.commit()
-        return self.cursor.rowcount
+        return self._execute(sql, params, _rowcount, commit=True)
 
     def execute(self, sql, params=None):
         """执行 SQL 语句"""
-        self.ensure_connected()
-        self.cursor.execute(sql, params or ())
-        self.connect.commit()
-        return self.cursor.rowcount
+        return self._execute(sql, params, _rowcount, commit=True)
 
     def execute_many(self, sql, params_list):
         """批量执行 SQL 语句"""
-        self.ensure_connected()
-        self.cursor.executemany(sql, params_list)
-        self.connect.commit()
-        return self.cursor.rowcount
+        return self._execute(sql, params_list, _rowcount, commit=True, many=True)
+
+
+def _quote_name(name):
+    """为表名或列名加反引号，支持 db.table 形式"""
+    return '.'.join('`' + part.replace('`', '``') + '`' for part in name.split('.'))
+
+
+def _byte_len(text):
+    """字符串按 UTF-8 编码后的长度"""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def _fetchall(cursor):
+    return cursor.fetchall()
+
+
+def _fetchone(cursor):
+    return cursor.fetchone()
+
+
+def _lastrowid(cursor):
+    return cursor.lastrowid
+
+
+def _rowcount(cursor):
+    return cursor.rowcount
+
 
+def _rowcount_lastrowid(cursor):
+    return cursor.rowcount, cursor.lastrowid
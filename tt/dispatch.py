@@ -0,0 +1,152 @@
+import asyncio
+import itertools
+import time
+from telethon import events
+from .log import Logger
+from .stats import _Histogram
+
+
+class HandlerGroup:
+    """事件处理组：有界队列加固定数量的工作协程，同一聊天的事件按到达顺序处理"""
+
+    POLICIES = ('block', 'drop', 'shed_oldest')
+
+    def __init__(self, name, workers=4, max_queue=1000, overflow='block', logger=None):
+        """
+        初始化处理组
+
+        事件按聊天 ID 分配到固定的工作协程，每个工作协程有自己的队列，
+        因此同一聊天的事件不会并发处理，慢处理器也只占用本组的工作协程。
+
+        Args:
+            name: 组名
+            workers: 工作协程数
+            max_queue: 组内排队事件总数上限，平均分配给各工作协程
+            overflow: 队列满时的策略：'block' 等待、'drop' 丢弃新事件、'shed_oldest' 丢弃最早的事件。
+                'block' 只有在 TelegramClient 以 sequential_updates=True 创建时才会反压到更新处理；
+                否则 Telethon 为每个更新创建任务，等待入队的任务数和内存不受限制
+            logger: 日志记录器
+        """
+        if overflow not in self.POLICIES:
+            raise ValueError(f"不支持的溢出策略: {overflow}")
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.logger = logger or Logger()
+        self._queues = None
+        self._tasks = []
+        self._counter = itertools.count()
+        self._wait = _Histogram()
+        self._latency = _Histogram()
+        self._max_depth = 0
+        self.handled = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def wrap(self, handler):
+        """
+        将处理器包装为入队回调，注册到 Telethon
+
+        Args:
+            handler: 异步事件处理函数
+
+        Returns:
+            异步回调函数
+        """
+        async def enqueue(event):
+            await self.put(handler, event)
+        return enqueue
+
+    async def put(self, handler, event):
+        """
+        将事件放入对应聊天的队列
+
+        Args:
+            handler: 事件处理函数
+            event: Telethon 事件
+        """
+        if self._queues is None:
+            self._start()
+        chat_id = getattr(event, 'chat_id', None)
+        index = next(self._counter) if chat_id is None else hash(chat_id)
+        queue = self._queues[index % self.workers]
+        item = (handler, event, time.monotonic())
+        if self.overflow == 'block':
+            await queue.put(item)
+        elif queue.full():
+            self.dropped += 1
+            if self.overflow == 'drop':
+                return
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(item)
+        else:
+            queue.put_nowait(item)
+        depth = self.depth
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+    @property
+    def depth(self):
+        """当前排队的事件数"""
+        return sum(q.qsize() for q in self._queues) if self._queues else 0
+
+    def _start(self):
+        """首个事件到达时创建队列和工作协程"""
+        size = max(1, self.max_queue // self.workers)
+        self._queues = [asyncio.Queue(size) for _ in range(self.workers)]
+        self._tasks = [asyncio.ensure_future(self._work(queue)) for queue in self._queues]
+
+    async def _work(self, queue):
+        """工作协程：依次处理队列中的事件"""
+        while True:
+            handler, event, queued = await queue.get()
+            started = time.monotonic()
+            self._wait.add(started - queued)
+            try:
+                await handler(event)
+            except events.StopPropagation:
+                # 各处理器独立排队，StopPropagation 无法阻止其他处理器
+                pass
+            except Exception:
+                self.errors += 1
+                self.logger.exception("事件处理组 %s 的处理器异常", self.name)
+            finally:
+                self._latency.add(time.monotonic() - started)
+                self.handled += 1
+                queue.task_done()
+
+    async def close(self, drain=True):
+        """
+        停止处理组
+
+        Args:
+            drain: 是否先处理完已排队的事件
+        """
+        if self._queues is None:
+            return
+        if drain:
+            await asyncio.gather(*(queue.join() for queue in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queues = None
+        self._tasks = []
+
+    def stats(self):
+        """
+        获取运行指标
+
+        Returns:
+            dict: 当前及最大队列深度、已处理、异常和丢弃数，排队等待和处理耗时分布（秒）
+        """
+        return {
+            'depth': self.depth,
+            'max_depth': self._max_depth,
+            'handled': self.handled,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'wait': self._wait.snapshot(),
+            'latency': self._latency.snapshot(),
+        }
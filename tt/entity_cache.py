@@ -0,0 +1,457 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from telethon import errors
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerSelf, InputPeerUser
+from .async_db import _call_db
+
+
+_USERNAME_RE = re.compile(r'^(?:https?://)?(?:www\.)?(?:t\.me/|telegram\.me/|@)?([a-z]\w{3,31})/?$', re.IGNORECASE)
+
+# input peer 与可序列化记录 (kind, peer_id, access_hash) 之间的转换
+_KINDS = {
+    InputPeerUser: 'user',
+    InputPeerChannel: 'channel',
+    InputPeerChat: 'chat',
+    InputPeerSelf: 'self',
+}
+
+
+def entity_key(entity):
+    """
+    将用户名、手机号或 ID 转为缓存键
+
+    Args:
+        entity: 用户名（可带 @ 或 t.me 链接）、手机号字符串或整数 ID
+
+    Returns:
+        str 或 int；无法缓存的实体（对象、邀请链接等）返回 None
+    """
+    if isinstance(entity, bool):
+        return None
+    if isinstance(entity, int):
+        return entity
+    if not isinstance(entity, str):
+        return None
+    text = entity.strip()
+    # 与 Telethon 一致：数字字符串按手机号处理
+    phone = text.lstrip('+').replace(' ', '').replace('-', '')
+    if phone.isdigit() and not text.startswith('-'):
+        return 'phone:' + phone
+    match = _USERNAME_RE.match(text)
+    if match:
+        return match.group(1).lower()
+    return None
+
+
+def peer_to_record(peer):
+    """input peer 转为 (kind, peer_id, access_hash)，不支持的类型返回 None"""
+    kind = _KINDS.get(type(peer))
+    if kind == 'user':
+        return kind, peer.user_id, peer.access_hash
+    if kind == 'channel':
+        return kind, peer.channel_id, peer.access_hash
+    if kind == 'chat':
+        return kind, peer.chat_id, 0
+    if kind == 'self':
+        return kind, 0, 0
+    return None
+
+
+def record_to_peer(kind, peer_id, access_hash):
+    """(kind, peer_id, access_hash) 转为 input peer"""
+    if kind == 'user':
+        return InputPeerUser(peer_id, access_hash)
+    if kind == 'channel':
+        return InputPeerChannel(peer_id, access_hash)
+    if kind == 'chat':
+        return InputPeerChat(peer_id)
+    return InputPeerSelf()
+
+
+class FileEntityStore:
+    """
+    实体缓存的 JSON 文件存储，适合单进程和中小规模的实体数量
+
+    写入只修改内存中的数据并标记为待保存，最多 flush_interval 秒后在线程池中整体写入一次文件；
+    flush() / close() 立即保存。文件读写都不在事件循环中进行。
+    """
+
+    def __init__(self, path, flush_interval=5.0):
+        """
+        初始化文件存储
+
+        Args:
+            path: JSON 文件路径
+            flush_interval: 修改后最多延迟多少秒保存文件
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self._data = None
+        self._dirty = False
+        self._flush_task = None
+        self._lock = None
+
+    async def _load(self):
+        if self._data is None:
+            data = await asyncio.get_running_loop().run_in_executor(None, self._read)
+            # 等待读取期间其他协程可能已完成加载
+            if self._data is None:
+                self._data = data
+        return self._data
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    async def get_many(self, account, keys):
+        """
+        读取多个实体
+
+        Returns:
+            dict: {键: (kind, peer_id, access_hash, updated_at)}
+        """
+        data = (await self._load()).get(account, {})
+        found = {}
+        for key in keys:
+            record = data.get(str(key))
+            if record is not None:
+                found[key] = tuple(record)
+        return found
+
+    async def set_many(self, account, records):
+        """
+        写入多个实体，文件稍后批量保存
+
+        Args:
+            account: 账号（会话名）
+            records: {键: (kind, peer_id, access_hash, updated_at)}
+        """
+        if not records:
+            return
+        data = (await self._load()).setdefault(account, {})
+        for key, record in records.items():
+            data[str(key)] = list(record)
+        self._mark_dirty()
+
+    async def delete(self, account, key):
+        """删除一个实体"""
+        if (await self._load()).get(account, {}).pop(str(key), None) is not None:
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        """标记待保存，并在 flush_interval 秒后保存"""
+        self._dirty = True
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """立即保存未写入的修改"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # 在事件循环中序列化，避免写入线程读取时数据被修改
+            text = json.dumps(self._data)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, text)
+            except BaseException:
+                self._dirty = True
+                raise
+
+    async def close(self):
+        """取消延迟保存并立即保存"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def _write(self, text):
+        """原子地写入文件（先写临时文件再重命名）"""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, self.path)
+
+
+class DBEntityStore:
+    """实体缓存的 MySQL 存储，多个进程可共享"""
+
+    def __init__(self, db, table='tt_entities'):
+        """
+        初始化数据库存储
+
+        Args:
+            db: AsyncDB 或 DB 对象（DB 的查询在线程池中执行，不阻塞事件循环；
+                单连接的 DB 在专用线程中依次执行）
+            table: 表名
+        """
+        self.db = db
+        self.table = table
+
+    async def _call(self, method, *args, **kwargs):
+        """调用数据库方法：AsyncDB 直接等待，DB 放到线程池执行（单连接的 DB 依次执行）"""
+        return await _call_db(self.db, method, *args, **kwargs)
+
+    async def create_table(self):
+        """创建存储表（已存在时跳过）"""
+        await self._call('execute', f"""
+            CREATE TABLE IF NOT EXISTS `{self.table}` (
+                `account` VARCHAR(191) NOT NULL,
+                `entity_key` VARCHAR(191) NOT NULL,
+                `kind` VARCHAR(16) NOT NULL,
+                `peer_id` BIGINT NOT NULL,
+                `access_hash` BIGINT NOT NULL DEFAULT 0,
+                `updated_at` DOUBLE NOT NULL,
+                PRIMARY KEY (`account`, `entity_key`)
+            )
+        """)
+
+    async def get_many(self, account, keys):
+        """
+        读取多个实体
+
+        Returns:
+            dict: {键: (kind, peer_id, access_hash, updated_at)}
+        """
+        names = {str(key): key for key in keys}
+        if not names:
+            return {}
+        placeholders = ', '.join(['%s'] * len(names))
+        rows = await self._call(
+            'query',
+            f"SELECT entity_key, kind, peer_id, access_hash, updated_at FROM `{self.table}` "
+            f"WHERE account = %s AND entity_key IN ({placeholders})",
+            [account, *names],
+            cache_ttl=0,
+            row_format='tuple',
+        )
+        return {names[row[0]]: tuple(row[1:]) for row in rows}
+
+    async def set_many(self, account, records):
+        """
+        写入多个实体
+
+        Args:
+            account: 账号（会话名）
+            records: {键: (kind, peer_id, access_hash, updated_at)}
+        """
+        if not records:
+            return
+        rows = [(account, str(key), *record) for key, record in records.items()]
+        await self._call(
+            'bulk_upsert', self.table, rows,
+            columns=['account', 'entity_key', 'kind', 'peer_id', 'access_hash', 'updated_at'],
+        )
+
+    async def delete(self, account, key):
+        """删除一个实体"""
+        await self._call(
+            'delete', f"DELETE FROM `{self.table}` WHERE account = %s AND entity_key = %s", [account, str(key)]
+        )
+
+
+class EntityCache:
+    """实体解析缓存：用户名、手机号和 ID 到 input peer 的映射，内存 LRU 加可选的持久化存储"""
+
+    def __init__(self, max_entries=10000, ttl=86400, store=None, account=''):
+        """
+        初始化实体缓存
+
+        access_hash 只对获取它的账号有效，因此每个 TGClient 使用自己的缓存，
+        共享同一个存储时以 account 区分。
+
+        Args:
+            max_entries: 内存中最多缓存的实体数
+            ttl: 缓存有效期（秒），过期后重新解析；None 表示永不过期
+            store: 持久化存储（FileEntityStore、DBEntityStore），None 表示只用内存
+            account: 存储中区分账号的名称，默认使用会话名
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.account = account
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, updated_at):
+        return self.ttl is None or time.time() - updated_at < self.ttl
+
+    def _put(self, key, peer, updated_at):
+        self._entries[key] = (peer, updated_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key):
+        """
+        读取未过期的 input peer（内存未命中时查询存储）
+
+        Args:
+            key: entity_key() 返回的缓存键
+
+        Returns:
+            input peer，未命中返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry[1]):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if self.store is not None:
+            record = (await self.store.get_many(self.account, [key])).get(key)
+            if record is not None and self._fresh(record[3]):
+                peer = record_to_peer(*record[:3])
+                self._put(key, peer, record[3])
+                self.hits += 1
+                return peer
+        self.misses += 1
+        return None
+
+    async def set_many(self, peers):
+        """
+        写入多个解析结果
+
+        Args:
+            peers: {缓存键: input peer}
+        """
+        now = time.time()
+        records = {}
+        for key, peer in peers.items():
+            record = peer_to_record(peer)
+            if record is None:
+                continue
+            self._put(key, peer, now)
+            records[key] = (*record, now)
+        if self.store is not None:
+            await self.store.set_many(self.account, records)
+
+    async def missing(self, keys):
+        """
+        找出内存和存储中都没有未过期记录的键，存储中找到的记录载入内存
+
+        Returns:
+            list: 需要重新解析的键
+        """
+        keys = [key for key in dict.fromkeys(keys) if not self._memory_hit(key)]
+        if keys and self.store is not None:
+            found = await self.store.get_many(self.account, keys)
+            for key, record in found.items():
+                if self._fresh(record[3]):
+                    self._put(key, record_to_peer(*record[:3]), record[3])
+            keys = [key for key in keys if not self._memory_hit(key)]
+        return keys
+
+    def _memory_hit(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and self._fresh(entry[1])
+
+    async def flush(self):
+        """保存存储中尚未写入的修改（FileEntityStore 延迟批量保存）"""
+        flush = getattr(self.store, 'flush', None)
+        if flush is not None:
+            await flush()
+
+    async def invalidate(self, key):
+        """删除一个缓存项（例如用户名已易主）"""
+        self._entries.pop(key, None)
+        if self.store is not None:
+            await self.store.delete(self.account, key)
+
+    def stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 条目数、命中和未命中次数
+        """
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+async def resolve(client, entity, cache):
+    """
+    解析实体为 input peer，优先使用缓存
+
+    Args:
+        client: Telethon TelegramClient
+        entity: 用户名、手机号、ID 或实体对象
+        cache: EntityCache
+
+    Returns:
+        input peer；无法缓存的实体原样返回，由 Telethon 处理
+    """
+    key = entity_key(entity)
+    if key is None:
+        return entity
+    peer = await cache.get(key)
+    if peer is None:
+        peer = await client.get_input_entity(entity)
+        await cache.set_many({key: peer})
+    return peer
+
+
+async def prewarm(client, entities, cache, concurrency=3, max_flood_wait=60, logger=None):
+    """
+    批量预解析实体，已缓存的跳过
+
+    Args:
+        client: Telethon TelegramClient
+        entities: 实体列表
+        cache: EntityCache
+        concurrency: 同时解析的数量（ResolveUsername 限流严格，不宜过大）
+        max_flood_wait: 遇到不超过此秒数的 FloodWait 时等待后继续，否则停止预热
+        logger: 日志记录器
+
+    Returns:
+        dict: 解析失败的 {实体: 异常}
+    """
+    by_key = {}
+    for entity in entities:
+        key = entity_key(entity)
+        if key is not None:
+            by_key.setdefault(key, entity)
+    pending = await cache.missing(by_key)
+    failures = {}
+    resolved = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+
+    async def resolve_one(key):
+        entity = by_key[key]
+        async with semaphore:
+            while not stop.is_set():
+                try:
+                    resolved[key] = await client.get_input_entity(entity)
+                    return
+                except errors.FloodWaitError as e:
+                    if e.seconds > max_flood_wait:
+                        stop.set()
+                        failures[entity] = e
+                        return
+                    if logger is not None:
+                        logger.warning("预解析实体被限流，等待 %s 秒", e.seconds)
+                    await asyncio.sleep(e.seconds)
+                except Exception as e:
+                    failures[entity] = e
+                    return
+
+    await asyncio.gather(*(resolve_one(key) for key in pending))
+    await cache.set_many(resolved)
+    await cache.flush()
+    return failures
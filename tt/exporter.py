@@ -0,0 +1,209 @@
+import asyncio
+import time
+from telethon import utils
+from .async_db import _call_db
+from .log import Logger
+
+
+# 默认导出的列
+COLUMNS = ('chat_id', 'message_id', 'sender_id', 'date', 'reply_to', 'text', 'media')
+
+
+def message_row(chat_id, message):
+    """
+    将消息转为紧凑的行元组，与 COLUMNS 对应
+
+    Args:
+        chat_id: 聊天 ID
+        message: Telethon 消息对象
+
+    Returns:
+        tuple
+    """
+    media = message.media
+    return (
+        chat_id,
+        message.id,
+        message.sender_id,
+        message.date.replace(tzinfo=None) if message.date else None,
+        message.reply_to_msg_id,
+        message.message or None,
+        type(media).__name__ if media is not None else None,
+    )
+
+
+class HistoryExporter:
+    """聊天记录导出：分页拉取消息，批量写入数据库，按聊天记录已导出的最后一条消息 ID"""
+
+    def __init__(self, client, db, table='tt_messages', state_table='tt_export_state',
+                 batch_size=2000, queue_size=8, columns=COLUMNS, row_factory=message_row, logger=None):
+        """
+        初始化导出器
+
+        Args:
+            client: TGClient 或 Telethon 客户端
+            db: AsyncDB 或 DB 对象（DB 的写入在线程池中执行，不阻塞拉取；
+                单连接的 DB 在专用线程中依次执行，并发导出时建议启用连接池）
+            table: 消息表名
+            state_table: 导出进度表名
+            batch_size: 每次批量写入的消息数
+            queue_size: 拉取与写入之间最多缓冲的批次数，写入跟不上时拉取会等待
+            columns: 写入的列名，需与 row_factory 返回的元组对应
+            row_factory: 将 (chat_id, message) 转为行元组的函数
+            logger: 日志记录器
+        """
+        self.client = getattr(client, 'client', client)
+        self.db = db
+        self.table = table
+        self.state_table = state_table
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.columns = list(columns)
+        self.row_factory = row_factory
+        self.logger = logger or Logger()
+
+    async def _call(self, method, *args, **kwargs):
+        """调用数据库方法：AsyncDB 直接等待，DB 放到线程池执行（单连接的 DB 依次执行）"""
+        return await _call_db(self.db, method, *args, **kwargs)
+
+    async def create_tables(self):
+        """创建默认结构的消息表和进度表（已存在时跳过）"""
+        await self._call('execute', f"""
+            CREATE TABLE IF NOT EXISTS `{self.table}` (
+                `chat_id` BIGINT NOT NULL,
+                `message_id` INT NOT NULL,
+                `sender_id` BIGINT NULL,
+                `date` DATETIME NULL,
+                `reply_to` INT NULL,
+                `text` MEDIUMTEXT NULL,
+                `media` VARCHAR(64) NULL,
+                PRIMARY KEY (`chat_id`, `message_id`)
+            ) DEFAULT CHARSET=utf8mb4
+        """)
+        await self._call('execute', f"""
+            CREATE TABLE IF NOT EXISTS `{self.state_table}` (
+                `chat_id` BIGINT NOT NULL PRIMARY KEY,
+                `last_message_id` INT NOT NULL,
+                `exported` BIGINT NOT NULL DEFAULT 0,
+                `updated_at` DATETIME NOT NULL
+            )
+        """)
+
+    async def last_id(self, chat_id):
+        """
+        获取聊天已导出的最后一条消息 ID
+
+        Returns:
+            int: 尚未导出过时为 0
+        """
+        row = await self._call(
+            'query_one',
+            f"SELECT last_message_id FROM `{self.state_table}` WHERE chat_id = %s",
+            [chat_id],
+            cache_ttl=0,
+        )
+        return row['last_message_id'] if row else 0
+
+    async def export(self, entity, limit=None):
+        """
+        增量导出一个聊天：从上次导出的位置开始按时间顺序拉取新消息
+
+        拉取和写入并行进行；每批写入成功后才更新进度，中断后重新运行从最后写入的消息继续。
+
+        Args:
+            entity: 聊天实体
+            limit: 本次最多导出的消息数，None 表示全部
+
+        Returns:
+            int: 本次导出的消息数
+        """
+        entity = await self.client.get_input_entity(entity)
+        chat_id = utils.get_peer_id(entity)
+        min_id = await self.last_id(chat_id)
+        queue = asyncio.Queue(self.queue_size)
+        started = time.monotonic()
+
+        async def fetch():
+            batch = []
+            last_message_id = min_id
+            # reverse=True 从旧到新拉取，进度单调递增；wait_time=0 取消分页之间的固定等待
+            async for message in self.client.iter_messages(
+                entity, limit=limit, min_id=min_id, reverse=True, wait_time=0
+            ):
+                batch.append(self.row_factory(chat_id, message))
+                last_message_id = message.id
+                if len(batch) >= self.batch_size:
+                    await queue.put((batch, last_message_id))
+                    batch = []
+            if batch:
+                await queue.put((batch, last_message_id))
+            await queue.put(None)
+
+        async def write():
+            total = 0
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return total
+                rows, last_message_id = item
+                # INSERT IGNORE：上次写入成功但进度未保存时，重复的消息直接跳过
+                await self._call('bulk_insert', self.table, rows, columns=self.columns, ignore=True)
+                total += len(rows)
+                await self._save(chat_id, last_message_id, len(rows))
+
+        fetcher = asyncio.ensure_future(fetch())
+        writer = asyncio.ensure_future(write())
+        try:
+            await asyncio.wait([fetcher, writer], return_when=asyncio.FIRST_EXCEPTION)
+            if writer.done():
+                # 写入失败时直接抛出，finally 中停止拉取，避免队列满后拉取协程永久等待
+                writer.result()
+            await fetcher
+            total = await writer
+        finally:
+            fetcher.cancel()
+            writer.cancel()
+
+        elapsed = time.monotonic() - started
+        if total and elapsed:
+            self.logger.info("聊天 %s 导出 %d 条消息，耗时 %.1f 秒（%.0f 条/小时）",
+                             chat_id, total, elapsed, total / elapsed * 3600)
+        else:
+            self.logger.info("聊天 %s 导出 %d 条消息，耗时 %.1f 秒", chat_id, total, elapsed)
+        return total
+
+    async def export_many(self, entities, concurrency=2):
+        """
+        导出多个聊天
+
+        Args:
+            entities: 聊天实体列表
+            concurrency: 同时导出的聊天数
+
+        Returns:
+            dict: {实体: 导出的消息数或异常}
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results = {}
+
+        async def export_one(entity):
+            async with semaphore:
+                try:
+                    results[entity] = await self.export(entity)
+                except Exception as e:
+                    self.logger.error("导出聊天 %s 失败: %s", entity, e)
+                    results[entity] = e
+
+        await asyncio.gather(*(export_one(entity) for entity in entities))
+        return results
+
+    async def _save(self, chat_id, last_message_id, count):
+        """更新聊天的导出进度"""
+        await self._call(
+            'execute',
+            f"INSERT INTO `{self.state_table}` (chat_id, last_message_id, exported, updated_at) "
+            f"VALUES (%s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE "
+            f"last_message_id = VALUES(last_message_id), exported = exported + VALUES(exported), "
+            f"updated_at = VALUES(updated_at)",
+            [chat_id, last_message_id, count],
+        )
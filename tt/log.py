@@ -1,27 +1,626 @@
-from datetime import datetime
-import pytz
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import atexit
+import glob
+import gzip
+import itertools
+import json
 import logging
+import os
+import shutil
+import threading
+import time
+
+
+# 北京时间固定为 UTC+8（1991 年起不再实行夏令时），无需每次查询时区数据库
+BEIJING = timezone(timedelta(hours=8), 'Asia/Shanghai')
 
 
 def get_now():
     """获取北京时间"""
-    now = datetime.now(pytz.utc)
-    return now.astimezone(pytz.timezone('Asia/Shanghai'))
+    return datetime.now(BEIJING)
 
 
 class BeijingTimeFormatter(logging.Formatter):
     """使用北京时间的日志格式化器"""
     
+    default_time_format = "%Y-%m-%d %H:%M:%S"
+    default_msec_format = "%s,%03d"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (秒, datefmt, 格式化结果)：同一秒内的记录只调用一次 strftime
+        self._cached = (None, None, None)
+    
     def formatTime(self, record, datefmt=None):
-        """格式化时间为北京时间"""
-        t = get_now()
+        """按记录创建时间格式化为北京时间，未指定 datefmt 时附加毫秒"""
+        second = int(record.created)
+        cached_second, cached_fmt, s = self._cached
+        if second != cached_second or datefmt != cached_fmt:
+            t = datetime.fromtimestamp(second, BEIJING)
+            s = t.strftime(datefmt or self.default_time_format)
+            self._cached = (second, datefmt, s)
         if datefmt:
-            s = t.strftime(datefmt)
-        else:
-            s = t.strftime("%Y-%m-%d %H:%M:%S")
+            return s
+        return self.default_msec_format % (s, record.msecs)
+    
+    def format(self, record):
+        """格式化记录，结构化字段以 key=value 形式附加在行尾"""
+        s = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            s += ' ' + ' '.join(f"{k}={v}" for k, v in fields.items())
         return s
 
 
+# JSON 序列化函数，首次使用时选择（可选依赖 orjson 只在启用 JSON 日志后才导入）
+_encoder = None
+
+
+def _dumps(obj):
+    """序列化为紧凑 JSON：安装了 orjson 时使用 orjson，否则使用标准库"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import orjson
+            _encoder = lambda o: orjson.dumps(o, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except ImportError:
+            _encoder = lambda o: json.dumps(o, ensure_ascii=False, separators=(',', ':'), default=str)
+    return _encoder(obj)
+
+
+class JSONFormatter(BeijingTimeFormatter):
+    """每条记录输出为一行 JSON，结构化字段作为顶层键"""
+    
+    def format(self, record):
+        data = {
+            # ISO 8601 北京时间，毫秒精度，如 2024-01-01T08:00:00.123+08:00
+            'time': "%s.%03d+08:00" % (self.formatTime(record, '%Y-%m-%dT%H:%M:%S'), record.msecs),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        key = getattr(record, 'log_key', None)
+        if key is not None:
+            data['key'] = key
+        fields = getattr(record, 'fields', None)
+        if fields:
+            for k, v in fields.items():
+                data.setdefault(k, v)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return _dumps(data)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按消息键限流的过滤器：每个键一个令牌桶，超出速率的记录被丢弃
+
+    键默认为 (级别, 未格式化的消息模板)，也可在日志调用时通过 key= 指定。
+    某个键恢复输出时，其第一条记录附带字段 suppressed，表示期间丢弃的条数。
+    """
+
+    def __init__(self, rate=1.0, burst=10, sample=1.0, max_keys=10000):
+        """
+        初始化过滤器
+
+        Args:
+            rate: 每个键每秒补充的令牌数，None 表示不限流（仅采样）
+            burst: 每个键的令牌桶容量（允许的突发条数）
+            sample: 采样比例（0~1），通过限流的记录中按比例保留
+            max_keys: 最多跟踪的键数量，超过时清空重新计数
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self.max_keys = max_keys
+        # 键 -> [令牌数, 上次补充时间, 已通过限流的条数, 已丢弃条数]
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record):
+        # 过滤器挂在处理器上，同一记录经过多个处理器时只计数一次
+        decided = record.__dict__.get('_tt_rate_limit')
+        if decided is not None and decided[0] is self:
+            return decided[1]
+        passed = self._check(record)
+        record._tt_rate_limit = (self, passed)
+        return passed
+
+    def _check(self, record):
+        """按令牌桶和采样比例判断记录是否输出"""
+        key = getattr(record, 'log_key', None)
+        if key is None:
+            key = (record.levelno, record.msg if isinstance(record.msg, str) else repr(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                if len(self._keys) >= self.max_keys:
+                    self._keys.clear()
+                state = self._keys[key] = [self.burst, now, 0, 0]
+            elif self.rate is not None:
+                state[0] = min(self.burst, state[0] + (now - state[1]) * self.rate)
+                state[1] = now
+            passed = self.rate is None or state[0] >= 1
+            if passed:
+                if self.rate is not None:
+                    state[0] -= 1
+                if self.sample < 1:
+                    # 按计数确定性采样：每通过 1 / sample 条保留 1 条
+                    state[2] += 1
+                    passed = int(state[2] * self.sample) != int((state[2] - 1) * self.sample)
+            if not passed:
+                state[3] += 1
+                self.dropped += 1
+                return False
+            suppressed, state[3] = state[3], 0
+        if suppressed:
+            record.fields = dict(getattr(record, 'fields', None) or {}, suppressed=suppressed)
+        return True
+
+
+class LogQueue:
+    """
+    有界日志队列：日志调用只把记录放入队列，由后台线程批量写出
+
+    队列满时按 overflow 策略处理：
+        drop_debug  先丢弃 DEBUG 记录（新的 DEBUG 直接丢弃，更高级别的记录挤掉最早的 DEBUG），
+                    队列中没有 DEBUG 时丢弃新记录
+        drop_new    丢弃新记录
+        block       等待后台线程写出（不丢日志，但会阻塞调用方）
+    """
+
+    POLICIES = ('drop_debug', 'drop_new', 'block')
+
+    def __init__(self, max_size=10000, batch_size=256, overflow='drop_debug'):
+        """
+        初始化日志队列并启动后台线程
+
+        Args:
+            max_size: 队列中最多保留的记录数
+            batch_size: 后台线程每次最多写出的记录数
+            overflow: 队列满时的策略
+        """
+        if overflow not in self.POLICIES:
+            raise ValueError(f"不支持的溢出策略: {overflow}")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.overflow = overflow
+        # DEBUG 与其他级别分开排队，溢出时可以直接丢弃最早的 DEBUG；写出时按序号合并
+        self._low = deque()
+        self._high = deque()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self.dropped = {}
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name='tt-log', daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._low) + len(self._high)
+
+    def put(self, target, record):
+        """
+        放入一条记录
+
+        Args:
+            target: 最终写出记录的处理器
+            record: 日志记录
+        """
+        low = record.levelno <= logging.DEBUG
+        with self._cond:
+            if len(self) >= self.max_size:
+                if self.overflow == 'block':
+                    while len(self) >= self.max_size and not self._closed:
+                        self._cond.wait()
+                elif self.overflow == 'drop_debug' and not low and self._low:
+                    self._drop(self._low.popleft()[2])
+                else:
+                    self._drop(record)
+                    return
+            (self._low if low else self._high).append((next(self._seq), target, record))
+            self._cond.notify_all()
+
+    def _drop(self, record):
+        self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def _take(self):
+        """按入队顺序取出一批记录"""
+        batch = []
+        low, high = self._low, self._high
+        while len(batch) < self.batch_size and (low or high):
+            if not high or (low and low[0][0] < high[0][0]):
+                batch.append(low.popleft())
+            else:
+                batch.append(high.popleft())
+        return batch
+
+    def _run(self):
+        """后台线程：取出一批记录并写出"""
+        while True:
+            with self._cond:
+                while not len(self) and not self._closed:
+                    self._cond.wait()
+                if not len(self):
+                    return
+                batch = self._take()
+                self._busy = True
+                # 唤醒因队列满而等待的调用方
+                self._cond.notify_all()
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self.written += len(batch)
+                    self._cond.notify_all()
+
+    @staticmethod
+    def _write(batch):
+        """
+        写出一批记录：连续写往同一个流处理器的记录合并为一次 write 和一次 flush
+        """
+        i = 0
+        while i < len(batch):
+            target = batch[i][1]
+            j = i
+            while j < len(batch) and batch[j][1] is target:
+                j += 1
+            records = [item[2] for item in batch[i:j]]
+            i = j
+            if type(target) not in (logging.StreamHandler, logging.FileHandler):
+                for record in records:
+                    target.handle(record)
+                continue
+            try:
+                text = ''.join(
+                    target.format(r) + target.terminator for r in records
+                    if r.levelno >= target.level and target.filter(r)
+                )
+                if text:
+                    with target.lock:
+                        if target.stream is None:
+                            # FileHandler(delay=True) 首次写入时才打开文件
+                            target.stream = target._open()
+                        target.stream.write(text)
+                        target.stream.flush()
+            except Exception:
+                target.handleError(records[0])
+
+    def flush(self, timeout=5.0):
+        """
+        等待队列中的记录全部写出
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 是否在超时前写完
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not len(self) and not self._busy, timeout)
+
+    def close(self, timeout=5.0):
+        """写出剩余记录并停止后台线程"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        获取队列指标
+
+        Returns:
+            dict: 当前排队数、已写出数和按级别统计的丢弃数
+        """
+        with self._cond:
+            return {'queued': len(self), 'written': self.written, 'dropped': dict(self.dropped)}
+
+
+class QueuedHandler(logging.Handler):
+    """把记录交给 LogQueue 的处理器，替换原处理器挂在 logger 上"""
+
+    def __init__(self, target, log_queue):
+        """
+        Args:
+            target: 原处理器，由后台线程调用
+            log_queue: LogQueue
+        """
+        super().__init__(target.level)
+        self.target = target
+        self.log_queue = log_queue
+
+    def emit(self, record):
+        try:
+            # 在调用方线程固定消息和异常文本，避免参数对象之后被修改
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = _exc_formatter.formatException(record.exc_info)
+                record.exc_info = None
+            self.log_queue.put(self.target, record)
+        except Exception:
+            self.handleError(record)
+
+
+class RotatingFileSink(logging.Handler):
+    """
+    按大小和时间轮转的日志文件
+
+    记录写入大块缓冲区，不逐行 flush：ERROR 及以上的记录立即 flush，其余由后台线程
+    每 flush_interval 秒 flush 一次。轮转时只在写入线程中重命名文件，
+    压缩旧文件和清理超出保留数量的文件都在后台线程中进行。
+    """
+
+    COMPRESSIONS = (None, 'gzip', 'zstd')
+    WHEN = (None, 'midnight', 'hour')
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, when=None, backup_count=7, compress='gzip',
+                 buffer_size=1024 * 1024, flush_interval=1.0, level=logging.NOTSET):
+        """
+        初始化并打开日志文件
+
+        Args:
+            path: 日志文件路径
+            max_bytes: 文件超过此大小时轮转，None 表示不按大小轮转
+            when: 按时间轮转：'midnight' 每天北京时间零点、'hour' 每小时，None 表示不按时间轮转
+            backup_count: 保留的历史文件数，0 表示不清理
+            compress: 历史文件的压缩方式：'gzip'、'zstd'（需安装 zstandard）或 None
+            buffer_size: 写缓冲区大小（字节）
+            flush_interval: 后台 flush 的间隔（秒）
+            level: 处理器级别
+        """
+        if compress not in self.COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compress}")
+        if compress == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ImportError("zstd 压缩需要安装 zstandard: pip install tt[zstd]") from None
+        if when not in self.WHEN:
+            raise ValueError(f"不支持的轮转周期: {when}")
+        super().__init__(level)
+        self.setFormatter(BeijingTimeFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.when = when
+        self.backup_count = backup_count
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._stream = None
+        self._size = 0
+        self._rollover_at = None
+        self._dirty = False
+        self._open()
+        # 待压缩的历史文件；None 表示停止后台线程
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='tt-log-sink', daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        """打开（追加）日志文件并计算下次按时间轮转的时刻"""
+        self._stream = open(self.path, 'ab', buffering=self.buffer_size)
+        self._size = self._stream.tell()
+        now = time.time()
+        if self.when == 'midnight':
+            # 北京时间零点：按 UTC+8 对齐到天
+            offset = 8 * 3600
+            self._rollover_at = ((now + offset) // 86400 + 1) * 86400 - offset
+        elif self.when == 'hour':
+            self._rollover_at = (now // 3600 + 1) * 3600
+        else:
+            self._rollover_at = None
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + '\n').encode('utf-8')
+            if (self.max_bytes and self._size and self._size + len(data) > self.max_bytes) or \
+                    (self._rollover_at is not None and record.created >= self._rollover_at):
+                self._rollover()
+            self._stream.write(data)
+            self._size += len(data)
+            if record.levelno >= logging.ERROR:
+                self._stream.flush()
+            else:
+                self._dirty = True
+        except Exception:
+            self.handleError(record)
+
+    def _rollover(self):
+        """关闭当前文件并重命名，交给后台线程压缩和清理"""
+        self._stream.close()
+        rotated = f"{self.path}.{get_now().strftime('%Y%m%d-%H%M%S')}"
+        # 同一秒内多次轮转时序号取已有的最大序号加一：较小的序号可能已被后台清理删除，
+        # 重用会使新文件排在旧文件之前而被优先清理
+        taken = glob.glob(glob.escape(rotated) + '*')
+        if taken:
+            rotated = f"{rotated}.{max(self._backup_order(f)[1] for f in taken) + 1}"
+        os.replace(self.path, rotated)
+        self._dirty = False
+        self._open()
+        with self._cond:
+            self._jobs.append(rotated)
+            self._cond.notify()
+
+    def _run(self):
+        """后台线程：压缩历史文件、清理过期文件，并定期 flush 缓冲区"""
+        while True:
+            with self._cond:
+                if not self._jobs and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                jobs, self._jobs = self._jobs, []
+                closed = self._closed
+            if self._dirty:
+                self.flush()
+            for rotated in jobs:
+                try:
+                    self._compress(rotated)
+                    self._cleanup()
+                except Exception as e:
+                    logging.getLogger(__name__).error("压缩日志文件 %s 失败: %s", rotated, e)
+            if closed:
+                return
+
+    def _compress(self, rotated):
+        """压缩历史文件并删除原文件"""
+        if self.compress is None:
+            return
+        target = rotated + ('.gz' if self.compress == 'gzip' else '.zst')
+        with open(rotated, 'rb') as src:
+            if self.compress == 'gzip':
+                with gzip.open(target + '.tmp', 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            else:
+                import zstandard
+                with open(target + '.tmp', 'wb') as f:
+                    zstandard.ZstdCompressor(level=3).copy_stream(src, f)
+        os.replace(target + '.tmp', target)
+        os.remove(rotated)
+
+    def _cleanup(self):
+        """删除超出保留数量的最旧历史文件"""
+        if not self.backup_count:
+            return
+        backups = [
+            f for f in glob.glob(glob.escape(self.path) + '.*')
+            if not f.endswith('.tmp')
+        ]
+        backups.sort(key=self._backup_order)
+        for f in backups[:-self.backup_count]:
+            os.remove(f)
+
+    def _backup_order(self, name):
+        """历史文件按 (时间戳, 序号) 排序：文件名为 path.时间戳[.序号][.gz|.zst]"""
+        parts = name[len(self.path) + 1:].split('.')
+        index = parts[1] if len(parts) > 1 and parts[1].isdigit() else '0'
+        return parts[0], int(index)
+
+    def flush(self):
+        """将缓冲区写入文件"""
+        self.acquire()
+        try:
+            if self._stream is not None and not self._stream.closed:
+                self._stream.flush()
+            self._dirty = False
+        finally:
+            self.release()
+
+    def close(self, timeout=30.0):
+        """
+        写出缓冲区，等待后台压缩完成后关闭文件
+
+        Args:
+            timeout: 等待后台线程的最长秒数
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.acquire()
+        try:
+            if self._stream is not None:
+                self._stream.close()
+        finally:
+            self.release()
+        super().close()
+
+
+_exc_formatter = logging.Formatter()
+
+# tt 创建的日志记录器名称，启用异步日志时统一替换其处理器
+_managed = set()
+_log_queue = None
+# 结构化日志配置：(格式化器, 限流过滤器)，未启用时为 None
+_structured = None
+# add_file_sink() 添加的文件处理器
+_sinks = []
+
+
+def _manage(logger):
+    """登记 tt 管理的日志记录器，并应用已添加的文件处理器和已启用的异步 / 结构化日志配置"""
+    _managed.add(logger.name)
+    for sink in _sinks:
+        if not any(getattr(h, 'target', h) is sink for h in logger.handlers):
+            logger.addHandler(sink)
+    if _structured is not None:
+        _apply_structured(logger)
+    if _log_queue is not None:
+        _wrap_handlers(logger)
+
+
+def _wrap_handlers(logger):
+    """将日志记录器的处理器替换为 QueuedHandler"""
+    logger.handlers = [
+        h if isinstance(h, QueuedHandler) else QueuedHandler(h, _log_queue) for h in logger.handlers
+    ]
+    if _structured is not None:
+        # 限流过滤器移到 QueuedHandler 上，在入队前按原始消息模板计数
+        _apply_structured(logger)
+
+
+def enable_async_logging(max_size=10000, batch_size=256, overflow='drop_debug'):
+    """
+    启用异步日志：Logger 和 telethon 日志只入队，由后台线程批量写出，不阻塞事件循环
+
+    已启用时直接返回现有队列。
+
+    Args:
+        max_size: 队列中最多保留的记录数
+        batch_size: 后台线程每次最多写出的记录数
+        overflow: 队列满时的策略：'drop_debug'、'drop_new' 或 'block'
+
+    Returns:
+        LogQueue 对象，可通过 stats() 查看丢弃数
+    """
+    global _log_queue
+    if _log_queue is None:
+        _log_queue = LogQueue(max_size=max_size, batch_size=batch_size, overflow=overflow)
+        atexit.register(flush_logs)
+    for name in _managed:
+        _wrap_handlers(logging.getLogger(name))
+    return _log_queue
+
+
+def disable_async_logging():
+    """写出剩余日志，恢复同步写日志"""
+    global _log_queue
+    if _log_queue is None:
+        return
+    for name in _managed:
+        logger = logging.getLogger(name)
+        logger.handlers = [h.target if isinstance(h, QueuedHandler) else h for h in logger.handlers]
+    _log_queue.close()
+    _log_queue = None
+
+
+def flush_logs(timeout=5.0):
+    """
+    等待异步日志全部写出（未启用异步日志时直接返回）
+
+    Args:
+        timeout: 最长等待秒数
+    """
+    if _log_queue is not None:
+        _log_queue.flush(timeout)
+
+
+# 传给 logging 的关键字参数，其余关键字参数作为结构化字段
+_LOG_OPTIONS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+
 class Logger:
     """日志封装类"""
     
@@ -48,32 +647,59 @@ class Logger:
             
             # 添加处理器到日志记录器
             self.logger.addHandler(ch)
+        
+        _manage(self.logger)
+    
+    def _log(self, level, msg, args, kwargs):
+        """
+        记录日志：低于当前级别时直接返回，不格式化消息也不处理字段
+
+        msg 可以是可调用对象，仅在需要输出时调用以生成消息；除 exc_info、stack_info、
+        stacklevel、extra 外的关键字参数作为结构化字段，key 指定限流使用的消息键。
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        if callable(msg):
+            msg = msg()
+        options = {k: kwargs.pop(k) for k in _LOG_OPTIONS if k in kwargs}
+        key = kwargs.pop('key', None)
+        if kwargs or key is not None:
+            extra = dict(options.get('extra') or {})
+            extra['fields'] = kwargs
+            extra['log_key'] = key
+            options['extra'] = extra
+        self.logger.log(level, msg, *args, **options)
     
     def error(self, msg, *args, **kwargs):
         """记录错误日志"""
-        self.logger.error(msg, *args, **kwargs)
+        self._log(logging.ERROR, msg, args, kwargs)
     
     def info(self, msg, *args, **kwargs):
         """记录信息日志"""
-        self.logger.info(msg, *args, **kwargs)
+        self._log(logging.INFO, msg, args, kwargs)
     
     def warning(self, msg, *args, **kwargs):
         """记录警告日志"""
-        self.logger.warning(msg, *args, **kwargs)
+        self._log(logging.WARNING, msg, args, kwargs)
     
     def debug(self, msg, *args, **kwargs):
         """记录调试日志"""
-        self.logger.debug(msg, *args, **kwargs)
+        self._log(logging.DEBUG, msg, args, kwargs)
     
     def exception(self, msg, *args, **kwargs):
         """记录异常日志（包含堆栈信息）"""
-        self.logger.exception(msg, *args, **kwargs)
+        kwargs.setdefault('exc_info', True)
+        self._log(logging.ERROR, msg, args, kwargs)
 
 
 def setup_telethon_logger():
     """
     配置 telethon 库的日志，使其使用北京时间
+
+    导入 tt 时不再自动调用，创建第一个 TGClient 时配置（已手动配置过则跳过）。
     """
+    global _telethon_configured
+    _telethon_configured = True
     # 获取 telethon 的日志记录器
     telethon_logger = logging.getLogger('telethon')
     
@@ -91,38 +717,115 @@ def setup_telethon_logger():
     # 添加处理器
     telethon_logger.addHandler(ch)
     telethon_logger.setLevel(logging.INFO)
+    
+    _manage(telethon_logger)
 
 
-# 创建默认日志实例
-_default_logger = Logger()
+_telethon_configured = False
+
+
+def _ensure_telethon_logger():
+    """尚未配置 telethon 日志时进行配置"""
+    if not _telethon_configured:
+        setup_telethon_logger()
+
+
+def enable_structured_logging(json_format=True, rate=None, burst=10, sample=1.0):
+    """
+    启用结构化日志：Logger 和 telethon 日志输出为 JSON 行，并可按消息键限流
+
+    与 enable_async_logging() 可同时使用，JSON 序列化在后台线程中进行。
+
+    Args:
+        json_format: 是否输出 JSON（False 时保持文本格式，仅启用限流）
+        rate: 每个消息键每秒最多输出的条数，None 表示不限流
+        burst: 每个消息键允许的突发条数
+        sample: 采样比例（0~1）
+
+    Returns:
+        RateLimitFilter 对象（未启用限流时为 None），可通过 dropped 查看丢弃数
+    """
+    global _structured
+    log_filter = None
+    if rate is not None or sample < 1:
+        log_filter = RateLimitFilter(rate=rate, burst=burst, sample=sample)
+    _structured = (JSONFormatter() if json_format else None, log_filter)
+    for name in _managed:
+        _apply_structured(logging.getLogger(name))
+    return log_filter
+
+
+def _apply_structured(logger):
+    """
+    为日志记录器的处理器设置 JSON 格式化器和限流过滤器
+
+    过滤器挂在处理器（异步日志时为入队的 QueuedHandler）而不是记录器上：
+    子记录器（如 telethon.network）的记录向上传递时只经过父记录器的处理器，不经过其过滤器。
+    """
+    formatter, log_filter = _structured
+    for handler in logger.handlers:
+        target = getattr(handler, 'target', handler)
+        for h in {handler, target}:
+            for f in [f for f in h.filters if isinstance(f, RateLimitFilter)]:
+                h.removeFilter(f)
+        if log_filter is not None:
+            handler.addFilter(log_filter)
+        if formatter is not None:
+            target.setFormatter(formatter)
+
+
+def add_file_sink(path, max_bytes=100 * 1024 * 1024, when=None, backup_count=7, compress='gzip',
+                  buffer_size=1024 * 1024, flush_interval=1.0, level=logging.NOTSET):
+    """
+    为 Logger 和 telethon 日志（包括之后创建的 Logger）添加轮转文件输出
+
+    参数见 RotatingFileSink。
+
+    Returns:
+        RotatingFileSink 对象
+    """
+    sink = RotatingFileSink(
+        path, max_bytes=max_bytes, when=when, backup_count=backup_count, compress=compress,
+        buffer_size=buffer_size, flush_interval=flush_interval, level=level,
+    )
+    _sinks.append(sink)
+    for name in _managed:
+        _manage(logging.getLogger(name))
+    return sink
+
+
+# 默认日志实例，首次调用 err / info 等函数时创建
+_default_logger = None
+
+
+def _get_default_logger():
+    global _default_logger
+    if _default_logger is None:
+        _default_logger = Logger()
+    return _default_logger
 
 
 # 提供简便的函数接口
 def err(msg, *args, **kwargs):
     """记录错误日志"""
-    _default_logger.error(msg, *args, **kwargs)
+    _get_default_logger().error(msg, *args, **kwargs)
 
 
 def info(msg, *args, **kwargs):
     """记录信息日志"""
-    _default_logger.info(msg, *args, **kwargs)
+    _get_default_logger().info(msg, *args, **kwargs)
 
 
 def warn(msg, *args, **kwargs):
     """记录警告日志"""
-    _default_logger.warning(msg, *args, **kwargs)
+    _get_default_logger().warning(msg, *args, **kwargs)
 
 
 def debug(msg, *args, **kwargs):
     """记录调试日志"""
-    _default_logger.debug(msg, *args, **kwargs)
+    _get_default_logger().debug(msg, *args, **kwargs)
 
 
 def exception(msg, *args, **kwargs):
     """记录异常日志（包含堆栈信息）"""
-    _default_logger.exception(msg, *args, **kwargs)
-
-
-# 自动配置 telethon 日志
-setup_telethon_logger()
-
+    _get_default_logger().exception(msg, *args, **kwargs)
@@ -0,0 +1,362 @@
+import itertools
+import re
+import warnings
+from collections import deque, namedtuple
+
+
+Match = namedtuple('Match', ['pattern', 'value', 'start', 'end'])
+
+_LEADING_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+
+
+def _scope_flags(pattern):
+    """将开头的全局内联标志 (?i)... 改写为只作用于该正则的 (?i:...)，以便与其他正则合并"""
+    flags = ''
+    m = _LEADING_FLAGS.match(pattern)
+    while m:
+        flags += m.group(1)
+        pattern = pattern[m.end():]
+        m = _LEADING_FLAGS.match(pattern)
+    return f"(?{flags}:{pattern})" if flags else pattern
+
+
+class _Automaton:
+    """Aho-Corasick 自动机：一次扫描文本找出所有关键词，耗时与关键词数量基本无关"""
+
+    __slots__ = ('goto', 'fail', 'out')
+
+    def __init__(self, keywords):
+        goto = [{}]
+        out = [()]
+        for keyword in keywords:
+            node = 0
+            for ch in keyword:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+                node = nxt
+            out[node] = (keyword,)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                # 合并后缀节点的输出，匹配时无需沿失败链查找
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+
+    def iter(self, text):
+        """产出 (关键词, 结束位置)"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for keyword in out[node]:
+                    yield keyword, i + 1
+
+
+class KeywordMatcher:
+    """
+    多模式匹配器：关键词使用 Aho-Corasick 自动机，正则分组合并为少量组合正则
+
+    增删关键词不会立即重建主自动机：新增的关键词放入小的增量自动机，删除的关键词
+    在匹配时过滤，累计变更超过 merge_threshold 后才合并重建。
+    """
+
+    def __init__(self, case_sensitive=False, merge_threshold=256, regex_chunk=100):
+        """
+        初始化匹配器
+
+        Args:
+            case_sensitive: 是否区分大小写
+            merge_threshold: 增量或已删除的关键词超过此数量时重建主自动机
+            regex_chunk: 每个组合正则包含的正则数，增删正则时只重新编译所在分组
+        """
+        self.case_sensitive = case_sensitive
+        self.merge_threshold = merge_threshold
+        self.regex_chunk = regex_chunk
+        self._keywords = {}
+        self._main = _Automaton(())
+        self._main_keys = set()
+        self._delta_keys = set()
+        self._delta = None
+        self._removed = set()
+        self._regexes = {}
+        self._chunks = []
+        self._group_ids = itertools.count()
+        self._bulk = False
+        self._bulk_regexes = []
+
+    def _norm(self, text):
+        return text if self.case_sensitive else text.lower()
+
+    def __len__(self):
+        """关键词和正则总数"""
+        return len(self._keywords) + len(self._regexes)
+
+    def add(self, keyword, value=None):
+        """
+        添加关键词（已存在时更新其值）
+
+        Args:
+            keyword: 关键词
+            value: 匹配时返回的值（如规则 ID），默认为关键词本身
+        """
+        key = self._norm(keyword)
+        if not key:
+            raise ValueError("关键词不能为空")
+        self._keywords[key] = (keyword, keyword if value is None else value)
+        if key in self._removed:
+            self._removed.discard(key)
+        elif key not in self._main_keys and key not in self._delta_keys:
+            self._delta_keys.add(key)
+            self._delta = None
+            if len(self._delta_keys) > self.merge_threshold and not self._bulk:
+                self._merge()
+
+    def remove(self, keyword):
+        """
+        删除关键词
+
+        Returns:
+            bool: 关键词是否存在
+        """
+        key = self._norm(keyword)
+        if self._keywords.pop(key, None) is None:
+            return False
+        if key in self._delta_keys:
+            self._delta_keys.discard(key)
+            self._delta = None
+        else:
+            self._removed.add(key)
+            if len(self._removed) > self.merge_threshold and not self._bulk:
+                self._merge()
+        return True
+
+    def add_regex(self, pattern, value=None):
+        """
+        添加正则（已存在时更新其值）
+
+        正则会与其他正则合并为一个组合正则，因此不能使用编号反向引用（如 \\1），
+        命名分组的名称也不能与其他正则重复。开头的全局内联标志（如 (?i)）
+        改写为只作用于本正则的 (?i:...)，其他位置的全局内联标志不支持。
+
+        Args:
+            pattern: 正则表达式字符串
+            value: 匹配时返回的值，默认为正则字符串本身
+
+        Raises:
+            re.error: 正则语法错误，或无法与同组的其他正则合并
+            ValueError: 正则中间使用了全局内联标志
+        """
+        value = pattern if value is None else value
+        if pattern in self._regexes:
+            chunk = self._regexes[pattern]
+            name, _, source = chunk['patterns'][pattern]
+            chunk['patterns'][pattern] = (name, value, source)
+            return
+        source = _scope_flags(pattern)
+        # 单独编译一次，尽早报告语法错误
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                re.compile(source)
+            except DeprecationWarning:
+                raise ValueError(f"正则中间不能使用全局内联标志: {pattern}") from None
+        chunk = self._chunks[-1] if self._chunks else None
+        created = chunk is None or len(chunk['patterns']) >= self.regex_chunk
+        if created:
+            chunk = {'patterns': {}, 'names': {}, 'regex': None}
+        name = f"_tt{next(self._group_ids)}"
+        chunk['patterns'][pattern] = (name, value, source)
+        chunk['names'][name] = pattern
+        if self._bulk:
+            chunk['regex'] = None
+            self._bulk_regexes.append(pattern)
+        else:
+            try:
+                self._compile(chunk)
+            except re.error:
+                # 组合正则编译失败（如命名分组重名）时撤销，分组保持原样
+                del chunk['patterns'][pattern]
+                del chunk['names'][name]
+                raise
+        if created:
+            self._chunks.append(chunk)
+        self._regexes[pattern] = chunk
+
+    def remove_regex(self, pattern):
+        """
+        删除正则
+
+        Returns:
+            bool: 正则是否存在
+        """
+        chunk = self._regexes.get(pattern)
+        if chunk is None:
+            return False
+        self._discard_regex(pattern)
+        if chunk['patterns']:
+            self._compile(chunk)
+        return True
+
+    def _discard_regex(self, pattern):
+        """从所在分组中删除正则，不重新编译；分组为空时移除分组"""
+        chunk = self._regexes.pop(pattern)
+        name, _, _ = chunk['patterns'].pop(pattern)
+        del chunk['names'][name]
+        if not chunk['patterns']:
+            self._chunks.remove(chunk)
+
+    def update(self, items, regex=False):
+        """
+        批量添加，全部添加后最多重建一次主自动机
+
+        批量添加正则时，某个组合正则编译失败会撤销本次添加到该分组的所有正则并抛出异常。
+
+        Args:
+            items: 关键词（或正则）序列，或 (关键词, 值) 序列
+            regex: items 是否为正则
+        """
+        add = self.add_regex if regex else self.add
+        self._bulk = True
+        self._bulk_regexes = []
+        try:
+            for item in items:
+                if isinstance(item, (tuple, list)):
+                    add(item[0], item[1])
+                else:
+                    add(item)
+        finally:
+            self._bulk = False
+            added, self._bulk_regexes = self._bulk_regexes, []
+            error = None
+            for chunk in list(self._chunks):
+                if chunk['regex'] is not None:
+                    continue
+                try:
+                    self._compile(chunk)
+                except re.error as e:
+                    error = e
+                    for pattern in added:
+                        if self._regexes.get(pattern) is chunk:
+                            self._discard_regex(pattern)
+                    if chunk['patterns']:
+                        self._compile(chunk)
+        if error is not None:
+            raise error
+        if len(self._delta_keys) > self.merge_threshold:
+            self._merge()
+
+    def _compile(self, chunk):
+        """重新编译一个正则分组（编译失败时分组保持原样）"""
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        chunk['regex'] = re.compile(
+            '|'.join(f"(?P<{name}>{source})" for name, _, source in chunk['patterns'].values()),
+            flags,
+        )
+
+    def _merge(self):
+        """将增量关键词和删除记录合并进主自动机"""
+        self._main_keys = set(self._keywords)
+        self._main = _Automaton(self._main_keys)
+        self._delta_keys.clear()
+        self._delta = None
+        self._removed.clear()
+
+    def _iter_keywords(self, text):
+        """产出 (关键词键, 结束位置)"""
+        text = self._norm(text)
+        removed = self._removed
+        for key, end in self._main.iter(text):
+            if key not in removed:
+                yield key, end
+        if self._delta_keys:
+            if self._delta is None:
+                self._delta = _Automaton(self._delta_keys)
+            yield from self._delta.iter(text)
+
+    def search(self, text):
+        """
+        查找第一个匹配（关键词优先于正则）
+
+        Args:
+            text: 文本
+
+        Returns:
+            Match 或 None
+        """
+        if not text:
+            return None
+        for key, end in self._iter_keywords(text):
+            keyword, value = self._keywords[key]
+            return Match(keyword, value, end - len(key), end)
+        for chunk in self._chunks:
+            m = chunk['regex'].search(text)
+            if m:
+                pattern = chunk['names'][m.lastgroup]
+                return Match(pattern, chunk['patterns'][pattern][1], m.start(), m.end())
+        return None
+
+    def find_all(self, text):
+        """
+        查找所有匹配
+
+        关键词的所有出现（包括重叠）都会返回；同一组合正则内的匹配互不重叠，
+        同一位置有多个正则可匹配时只返回最先添加的一个。
+
+        Args:
+            text: 文本
+
+        Returns:
+            list: 按起始位置排序的 Match 列表
+        """
+        if not text:
+            return []
+        matches = []
+        for key, end in self._iter_keywords(text):
+            keyword, value = self._keywords[key]
+            matches.append(Match(keyword, value, end - len(key), end))
+        for chunk in self._chunks:
+            for m in chunk['regex'].finditer(text):
+                pattern = chunk['names'][m.lastgroup]
+                matches.append(Match(pattern, chunk['patterns'][pattern][1], m.start(), m.end()))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
+
+    def values(self, text):
+        """
+        返回文本匹配到的所有值（去重，保持首次出现的顺序）
+
+        Args:
+            text: 文本
+
+        Returns:
+            list: 值列表
+        """
+        return list(dict.fromkeys(m.value for m in self.find_all(text)))
+
+    def __call__(self, event):
+        """
+        作为 Telethon 事件过滤器使用：events.NewMessage(func=matcher)
+
+        匹配结果保存在 event.keyword_matches 中
+
+        Returns:
+            bool: 消息文本是否有匹配
+        """
+        matches = self.find_all(getattr(event, 'raw_text', None) or '')
+        event.keyword_matches = matches
+        return bool(matches)
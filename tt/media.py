@@ -0,0 +1,244 @@
+import asyncio
+import json
+import mmap
+import os
+import random
+import time
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+from telethon.tl.types import InputFile, InputFileBig
+from .sender import TokenBucket
+
+
+# 下载分片大小：Telegram 单次最多 512KB，偏移需按分片大小对齐
+PART_SIZE = 512 * 1024
+# 超过此大小的文件上传时需使用 SaveBigFilePart
+BIG_FILE_SIZE = 10 * 1024 * 1024
+
+
+class TransferThrottle:
+    """传输限速：可在多个账号之间共享，限制总带宽和同时传输的分片数"""
+
+    def __init__(self, bytes_per_second=None, max_parts=None):
+        """
+        初始化限速
+
+        Args:
+            bytes_per_second: 总带宽上限（字节/秒），None 表示不限
+            max_parts: 同时传输的分片数上限，None 表示不限
+        """
+        self.bucket = TokenBucket(bytes_per_second, bytes_per_second) if bytes_per_second else None
+        self.max_parts = max_parts
+        # 首次使用时创建，避免 Python 3.9 及以下绑定到构造时的事件循环
+        self._slots = None
+        self.transferred = 0
+
+    async def __aenter__(self):
+        if self.max_parts:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_parts)
+            await self._slots.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._slots is not None:
+            self._slots.release()
+
+    async def consume(self, nbytes):
+        """
+        记录传输的字节数，超过带宽时等待
+
+        Args:
+            nbytes: 字节数
+        """
+        self.transferred += nbytes
+        if self.bucket is not None:
+            wait = self.bucket.take(time.monotonic(), nbytes)
+            if wait:
+                await asyncio.sleep(wait)
+
+
+async def _run_workers(worker, count):
+    """运行 count 个工作协程；任一失败时取消其余协程，避免在文件映射关闭后继续写入"""
+    tasks = [asyncio.ensure_future(worker()) for _ in range(max(1, count))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _document(media):
+    """从消息或媒体中取出 Document，不是文档时返回 None"""
+    for obj in (media, getattr(media, 'media', None)):
+        document = getattr(obj, 'document', None)
+        if document is not None:
+            return document
+    if hasattr(media, 'file_reference') and hasattr(media, 'size') and hasattr(media, 'dc_id'):
+        return media
+    return None
+
+
+def _load_progress(path, document, part_size):
+    """读取断点续传记录，文件不匹配时返回空集合"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return set()
+    if (data.get('id'), data.get('size'), data.get('part_size')) != (document.id, document.size, part_size):
+        return set()
+    return set(data.get('parts', ()))
+
+
+def _save_progress(path, document, part_size, parts):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'id': document.id, 'size': document.size, 'part_size': part_size, 'parts': sorted(parts)}, f)
+    os.replace(tmp, path)
+
+
+async def download_fast(client, media, path, concurrency=8, part_size=PART_SIZE, throttle=None,
+                        progress_callback=None):
+    """
+    并行分片下载文档到文件
+
+    文件先预分配为 path + '.part' 并映射到内存，各分片直接写入对应位置；
+    已完成的分片记录在 path + '.part.json'，中断后再次调用只下载缺少的分片。
+    非文档媒体（如图片）使用 Telethon 的普通下载。
+
+    Args:
+        client: Telethon 客户端
+        media: 消息、媒体或 Document
+        path: 保存路径
+        concurrency: 同时下载的分片数
+        part_size: 分片大小，需为 4096 的倍数且能整除 1MB
+        throttle: TransferThrottle，多个账号共享时限制总带宽
+        progress_callback: 进度回调 (已下载字节数, 总字节数)
+
+    Returns:
+        str: 保存路径
+    """
+    document = _document(media)
+    if document is None or not document.size:
+        return await client.download_media(media, file=path, progress_callback=progress_callback)
+    if part_size % 4096 or (1024 * 1024) % part_size:
+        raise ValueError("part_size 需为 4096 的倍数且能整除 1MB")
+
+    size = document.size
+    temp_path = f"{path}.part"
+    progress_path = f"{temp_path}.json"
+    total_parts = (size + part_size - 1) // part_size
+    done = _load_progress(progress_path, document, part_size) if os.path.exists(temp_path) else set()
+    pending = [part for part in range(total_parts) if part not in done]
+    downloaded = sum(min(part_size, size - part * part_size) for part in done)
+
+    with open(temp_path, 'a+b') as f:
+        f.truncate(size)
+    with open(temp_path, 'r+b') as f, mmap.mmap(f.fileno(), size) as mm:
+        queue = iter(pending)
+        saved_at = time.monotonic()
+
+        async def fetch(part):
+            offset = part * part_size
+            length = min(part_size, size - offset)
+            async for chunk in client.iter_download(
+                document, offset=offset, request_size=part_size, chunk_size=part_size, limit=1, file_size=size
+            ):
+                return chunk[:length]
+            return b''
+
+        async def worker():
+            nonlocal downloaded, saved_at
+            for part in queue:
+                if throttle is not None:
+                    async with throttle:
+                        chunk = await fetch(part)
+                    await throttle.consume(len(chunk))
+                else:
+                    chunk = await fetch(part)
+                offset = part * part_size
+                expected = min(part_size, size - offset)
+                if len(chunk) != expected:
+                    raise IOError(f"分片 {part} 大小不符: {len(chunk)} != {expected}")
+                mm[offset:offset + expected] = chunk
+                done.add(part)
+                downloaded += expected
+                if progress_callback is not None:
+                    progress_callback(downloaded, size)
+                # 定期落盘并保存进度，中断后可续传
+                if time.monotonic() - saved_at >= 1:
+                    saved_at = time.monotonic()
+                    mm.flush()
+                    _save_progress(progress_path, document, part_size, done)
+
+        try:
+            await _run_workers(worker, min(concurrency, len(pending)))
+        finally:
+            mm.flush()
+            _save_progress(progress_path, document, part_size, done)
+
+    os.replace(temp_path, path)
+    os.remove(progress_path)
+    return path
+
+
+async def upload_fast(client, path, concurrency=8, part_size=PART_SIZE, throttle=None, progress_callback=None):
+    """
+    并行分片上传文件，返回可传给 send_file 的 InputFile / InputFileBig
+
+    文件映射到内存后按分片读取，每次只复制当前分片。
+
+    Args:
+        client: Telethon 客户端
+        path: 文件路径
+        concurrency: 同时上传的分片数
+        part_size: 分片大小，需为 1024 的倍数且能整除 512KB
+        throttle: TransferThrottle，多个账号共享时限制总带宽
+        progress_callback: 进度回调 (已上传字节数, 总字节数)
+
+    Returns:
+        InputFile 或 InputFileBig
+    """
+    if part_size % 1024 or PART_SIZE % part_size:
+        raise ValueError("part_size 需为 1024 的倍数且能整除 512KB")
+    size = os.path.getsize(path)
+    if not size:
+        raise ValueError("不能上传空文件")
+    name = os.path.basename(path)
+    file_id = random.randrange(-2 ** 63, 2 ** 63)
+    total_parts = (size + part_size - 1) // part_size
+    big = size > BIG_FILE_SIZE
+    uploaded = 0
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        queue = iter(range(total_parts))
+
+        async def send(part, data):
+            if big:
+                request = SaveBigFilePartRequest(file_id, part, total_parts, data)
+            else:
+                request = SaveFilePartRequest(file_id, part, data)
+            if not await client(request):
+                raise IOError(f"分片 {part} 上传失败")
+
+        async def worker():
+            nonlocal uploaded
+            for part in queue:
+                data = mm[part * part_size:(part + 1) * part_size]
+                if throttle is not None:
+                    async with throttle:
+                        await send(part, data)
+                    await throttle.consume(len(data))
+                else:
+                    await send(part, data)
+                uploaded += len(data)
+                if progress_callback is not None:
+                    progress_callback(uploaded, size)
+
+        await _run_workers(worker, min(concurrency, total_parts))
+
+    if big:
+        return InputFileBig(file_id, total_parts, name)
+    # md5_checksum 可为空，服务器不做校验
+    return InputFile(file_id, total_parts, name, '')
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+class ConnectionPool:
+    """线程安全的 MySQL 连接池"""
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, idle_timeout=300,
+                 recycle=3600, timeout=10, ping_interval=30, stats=None):
+        """
+        初始化连接池（不会立即建立连接）
+
+        Args:
+            connect_kwargs: 传给 pymysql.connect 的参数
+            min_size: 最少保留的连接数，空闲回收不会低于此数量
+            max_size: 最大连接数
+            idle_timeout: 空闲超过此秒数的连接会被关闭
+            recycle: 连接存活超过此秒数后在借出时重建
+            timeout: 借出连接的最长等待秒数
+            ping_interval: 空闲超过此秒数的连接在借出前先 ping 检查
+            stats: QueryStats 对象，用于记录建立连接和 ping 的耗时
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("连接池大小配置无效")
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.stats = stats
+        # 空闲连接：(连接, 归还时间)，右端为最近归还
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+        """当前连接总数（空闲 + 借出）"""
+        return self._size
+
+    @property
+    def idle(self):
+        """当前空闲连接数"""
+        return len(self._idle)
+
+    def open(self):
+        """预先建立 min_size 个连接（已关闭时重新启用连接池）"""
+        self.reopen()
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self.release(conn)
+
+    def acquire(self, timeout=None):
+        """
+        借出一个连接
+
+        Args:
+            timeout: 等待秒数，None 使用连接池默认值
+
+        Returns:
+            pymysql 连接对象
+
+        Raises:
+            TimeoutError: 超时仍无可用连接
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            conn, last_used = self._checkout(deadline)
+            if conn is None:
+                try:
+                    return self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if self._validate(conn, last_used):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, discard=False):
+        """
+        归还连接
+
+        Args:
+            conn: 借出的连接
+            discard: 为 True 时直接关闭该连接而不放回池中
+        """
+        if not discard and not self._closed and conn.open:
+            try:
+                # 未提交的事务不能带给下一个使用者
+                if conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        else:
+            discard = True
+
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def reopen(self):
+        """重新启用已关闭的连接池，连接在借出时按需建立"""
+        with self._cond:
+            self._closed = False
+
+    def close(self):
+        """关闭连接池及所有空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def _create(self):
+        """建立新连接"""
+        start = time.perf_counter()
+        conn = pymysql.connect(**self.connect_kwargs)
+        if self.stats is not None:
+            self.stats.record_connect(time.perf_counter() - start)
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _checkout(self, deadline):
+        """
+        在锁内取出空闲连接或预留新建名额
+
+        Returns:
+            (连接, 归还时间)；连接为 None 表示调用方需要新建连接
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                self._reap_idle()
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待数据库连接超时（最大连接数 {self.max_size}）")
+                self._cond.wait(remaining)
+
+    def _reap_idle(self):
+        """关闭空闲过久的连接（需持有锁）"""
+        if not self.idle_timeout:
+            return
+        expire = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0][1] < expire:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._born.pop(id(conn), None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _validate(self, conn, last_used):
+        """检查连接年龄并在必要时 ping"""
+        now = time.monotonic()
+        if self.recycle and now - self._born.get(id(conn), now) > self.recycle:
+            return False
+        if now - last_used < self.ping_interval:
+            return True
+        start = time.perf_counter()
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+        finally:
+            if self.stats is not None:
+                self.stats.record_connect(time.perf_counter() - start, 'ping')
+
+    def _discard(self, conn):
+        """关闭连接并释放名额"""
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
@@ -0,0 +1,120 @@
+import itertools
+import threading
+import time
+
+
+class Replica:
+    """从库节点：连接池及健康、延迟状态"""
+
+    def __init__(self, name, pool):
+        """
+        初始化从库节点
+
+        Args:
+            name: 节点名称（host:port）
+            pool: 该从库的 ConnectionPool
+        """
+        self.name = name
+        self.pool = pool
+        self.latency = None
+        self.down_until = 0.0
+        self.failures = 0
+
+    @property
+    def healthy(self):
+        """当前是否可用"""
+        return self.down_until <= time.monotonic()
+
+
+class ReplicaSet:
+    """从库集合，负责选择节点和标记故障节点"""
+
+    POLICIES = ('round_robin', 'least_latency')
+
+    def __init__(self, replicas, policy='round_robin', retry_after=30, alpha=0.2):
+        """
+        初始化从库集合
+
+        Args:
+            replicas: Replica 列表
+            policy: 选择策略，'round_robin' 轮询或 'least_latency' 最低延迟
+            retry_after: 节点故障后暂停使用的秒数
+            alpha: 延迟指数滑动平均的权重
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的从库选择策略: {policy}")
+        self.replicas = list(replicas)
+        self.policy = policy
+        self.retry_after = retry_after
+        self.alpha = alpha
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """
+        选择一个可用的从库
+
+        Returns:
+            Replica，全部不可用时返回 None（调用方改用主库）
+        """
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        if self.policy == 'least_latency':
+            # 尚无延迟数据的节点优先，以便尽快获得测量值
+            return min(healthy, key=lambda r: -1.0 if r.latency is None else r.latency)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def observe(self, replica, elapsed):
+        """
+        记录一次成功读取的耗时
+
+        Args:
+            replica: 从库节点
+            elapsed: 耗时（秒）
+        """
+        with self._lock:
+            if replica.latency is None:
+                replica.latency = elapsed
+            else:
+                replica.latency += self.alpha * (elapsed - replica.latency)
+            replica.failures = 0
+
+    def mark_down(self, replica):
+        """
+        标记从库故障，retry_after 秒内不再选择
+
+        Args:
+            replica: 从库节点
+        """
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_after
+
+    def status(self):
+        """
+        获取各从库状态
+
+        Returns:
+            list: 每个节点的名称、是否可用、平均延迟、连续失败次数和连接数
+        """
+        return [
+            {
+                'name': r.name,
+                'healthy': r.healthy,
+                'latency': r.latency,
+                'failures': r.failures,
+                'connections': r.pool.size,
+            }
+            for r in self.replicas
+        ]
+
+    def close(self):
+        """关闭所有从库连接池"""
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def reopen(self):
+        """重新启用已关闭的从库连接池"""
+        for replica in self.replicas:
+            replica.pool.reopen()
@@ -0,0 +1,105 @@
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+import pymysql
+
+
+# 支持的行格式：
+#   dict    每行一个字典（默认）
+#   tuple   每行一个元组
+#   record  每行一个 namedtuple，列名只保存在共享的类上
+#   columns 列式结果 {列名: [值, ...]}
+#   arrays  列式结果，整数 / 浮点且不含 NULL 的列使用 array，其余列使用 list
+ROW_FORMATS = ('dict', 'tuple', 'record', 'columns', 'arrays')
+COLUMNAR_FORMATS = ('columns', 'arrays')
+
+
+def cursor_class(row_format, unbuffered=False):
+    """
+    根据行格式选择游标类型
+
+    Args:
+        row_format: 行格式
+        unbuffered: 是否使用无缓冲游标
+
+    Returns:
+        pymysql 游标类
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"不支持的行格式: {row_format}")
+    if row_format == 'dict':
+        return pymysql.cursors.SSDictCursor if unbuffered else pymysql.cursors.DictCursor
+    return pymysql.cursors.SSCursor if unbuffered else pymysql.cursors.Cursor
+
+
+def column_names(description):
+    """从游标描述中取列名"""
+    return tuple(d[0] for d in description or ())
+
+
+@lru_cache(maxsize=256)
+def record_class(names):
+    """
+    获取列名对应的记录类（按列名缓存）
+
+    Args:
+        names: 列名元组
+
+    Returns:
+        namedtuple 类，非法标识符的列名会被重命名为 _0、_1 ...
+    """
+    return namedtuple('Record', names, rename=True)
+
+
+def convert(rows, description, row_format):
+    """
+    将元组行转换为指定格式
+
+    Args:
+        rows: 游标返回的元组行序列
+        description: 游标描述
+        row_format: 行格式（不含 dict）
+
+    Returns:
+        list 或列式字典
+    """
+    if row_format == 'tuple':
+        return list(rows)
+    names = column_names(description)
+    if row_format == 'record':
+        make = record_class(names)._make
+        return [make(row) for row in rows]
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    if row_format == 'arrays':
+        return {name: _to_array(values) for name, values in zip(names, columns)}
+    return {name: list(values) for name, values in zip(names, columns)}
+
+
+def convert_one(row, description, row_format):
+    """
+    将单个元组行转换为指定格式
+
+    Args:
+        row: 元组行或 None
+        description: 游标描述
+        row_format: 'tuple' 或 'record'
+
+    Returns:
+        元组、记录或 None
+    """
+    if row is None or row_format == 'tuple':
+        return row
+    return record_class(column_names(description))._make(row)
+
+
+def _to_array(values):
+    """整数或浮点列转为 array，其他列保持 list"""
+    if values and all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return list(values)
+    if values and all(type(v) is float for v in values):
+        return array('d', values)
+    return list(values)
@@ -0,0 +1,411 @@
+import asyncio
+import time
+from collections import deque
+from telethon import errors
+from .log import Logger
+
+
+# 优先级：数值越小越先发送
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发数量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """
+        距离下一个令牌可用的秒数
+
+        Args:
+            now: 当前 time.monotonic()
+
+        Returns:
+            float: 0 表示立即可用
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now, n=1):
+        """
+        消耗令牌，不足时允许透支，透支部分由后续补充抵扣
+
+        Args:
+            now: 当前 time.monotonic()
+            n: 消耗的令牌数
+
+        Returns:
+            float: 透支量按速率折算的等待秒数，0 表示没有透支
+        """
+        self._refill(now)
+        self.tokens -= n
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    @property
+    def full(self):
+        """桶是否已满（长时间未使用）"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _Lane:
+    """账号或聊天的发送状态：令牌桶、暂停时间和是否有发送中的消息"""
+
+    __slots__ = ('bucket', 'parked_until', 'busy')
+
+    def __init__(self, rate, capacity):
+        self.bucket = TokenBucket(rate, capacity)
+        self.parked_until = 0.0
+        self.busy = False
+
+    def delay(self, now):
+        if self.busy:
+            return float('inf')
+        return max(self.bucket.delay(now), self.parked_until - now)
+
+
+class _Job:
+    """待发送的消息"""
+
+    __slots__ = ('entity', 'message', 'kwargs', 'future', 'chat', 'client', 'priority', 'attempts', 'queued')
+
+    def __init__(self, entity, message, kwargs, future, chat, client, priority):
+        self.entity = entity
+        self.message = message
+        self.kwargs = kwargs
+        self.future = future
+        self.chat = chat
+        self.client = client
+        self.priority = priority
+        self.attempts = 0
+        # 是否在队列中等待发送（计入 pending）
+        self.queued = True
+
+
+class SendQueue:
+    """发送队列：按账号和聊天限速，按优先级调度，FloodWait 时只暂停受影响的账号或聊天"""
+
+    def __init__(self, clients, account_rate=1.0, account_burst=3, chat_rate=1.0, chat_burst=1,
+                 max_pending=10000, max_retries=3, max_flood_wait=3600, logger=None):
+        """
+        初始化发送队列
+
+        各客户端的 flood_sleep_threshold 会被设为 0：FloodWait 不再由 Telethon 原地等待，
+        而是立即抛出，由队列暂停该账号并把消息交给其他账号。
+
+        Args:
+            clients: TGClient、TGClient 列表或 TGClientPool
+            account_rate: 每个账号每秒发送数
+            account_burst: 每个账号允许的突发数量
+            chat_rate: 每个聊天每秒接收数
+            chat_burst: 每个聊天允许的突发数量
+            max_pending: 排队消息上限，超过时 submit() 抛出 asyncio.QueueFull
+            max_retries: 单条消息因限流重新排队的最大次数
+            max_flood_wait: FloodWait 超过此秒数时直接让该消息失败
+            logger: 日志记录器
+        """
+        if hasattr(clients, 'accounts'):
+            clients = [a.client for a in clients.accounts if a.healthy]
+        elif not isinstance(clients, (list, tuple)):
+            clients = [clients]
+        if not clients:
+            raise ValueError("至少需要一个客户端")
+        for client in clients:
+            getattr(client, 'client', client).flood_sleep_threshold = 0
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        self.logger = logger or Logger()
+        self._accounts = {client: _Lane(account_rate, account_burst) for client in clients}
+        self._chats = {}
+        self._lanes = {}
+        self._pending = 0
+        self._inflight = set()
+        self._wakeup = None
+        self._idle = None
+        self._task = None
+        self._stopping = False
+        self._sent = 0
+        self._failed = 0
+        self._flood_waits = 0
+        self._finished = 0
+
+    def submit(self, entity, message, priority=NORMAL, client=None, **kwargs):
+        """
+        提交一条消息
+
+        Args:
+            entity: 目标实体（用户名、ID 等）
+            message: 消息内容
+            priority: 优先级，HIGH / NORMAL / LOW 或任意整数，越小越优先
+            client: 指定发送账号（TGClient），None 表示由队列选择
+            **kwargs: 传给 send_message 的其他参数
+
+        Returns:
+            asyncio.Future：结果为发送的消息对象，失败时为异常
+
+        Raises:
+            asyncio.QueueFull: 排队消息已达上限
+        """
+        if self._pending >= self.max_pending:
+            raise asyncio.QueueFull
+        if client is not None and client not in self._accounts:
+            raise ValueError("指定的客户端不属于该队列")
+        loop = asyncio.get_running_loop()
+        self._ensure_started(loop)
+        future = loop.create_future()
+        job = _Job(entity, message, kwargs, future, _chat_key(entity), client, priority)
+        future.add_done_callback(lambda _: self._dequeued(job))
+        self._lane(priority).append(job)
+        self._pending += 1
+        self._wakeup.set()
+        return future
+
+    async def send(self, entity, message, priority=NORMAL, client=None, **kwargs):
+        """
+        提交一条消息并等待发送结果
+
+        Returns:
+            发送的消息对象
+        """
+        return await self.submit(entity, message, priority=priority, client=client, **kwargs)
+
+    def attach(self, app):
+        """
+        在 TelegramApp 关闭时等待队列发送完毕
+
+        Args:
+            app: TelegramApp 对象
+        """
+        app.on_shutdown(self.close)
+        return self
+
+    async def drain(self):
+        """等待所有排队和发送中的消息完成"""
+        while self._pending or self._inflight:
+            self._idle.clear()
+            await self._idle.wait()
+
+    async def close(self, drain=True):
+        """
+        停止队列
+
+        Args:
+            drain: 是否先等待排队消息发送完毕；否则取消所有未发送的消息
+        """
+        if drain:
+            await self.drain()
+        for lane in self._lanes.values():
+            for job in lane:
+                job.queued = False
+                job.future.cancel()
+            lane.clear()
+        self._pending = 0
+        if self._task is not None:
+            # 通过标志让调度循环自行退出：wait_for 被唤醒的同时取消任务可能会丢失取消
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._task
+            finally:
+                self._task = None
+                self._stopping = False
+
+    def stats(self):
+        """
+        获取运行指标
+
+        Returns:
+            dict: 各优先级排队数、发送中、成功、失败、FloodWait 次数和暂停中的账号数
+        """
+        now = time.monotonic()
+        return {
+            'pending': {priority: len(lane) for priority, lane in self._lanes.items()},
+            'inflight': len(self._inflight),
+            'sent': self._sent,
+            'failed': self._failed,
+            'flood_waits': self._flood_waits,
+            'parked_accounts': sum(1 for a in self._accounts.values() if a.parked_until > now),
+            'parked_chats': sum(1 for c in self._chats.values() if c.parked_until > now),
+        }
+
+    def _lane(self, priority):
+        """获取优先级对应的队列，按优先级保持有序"""
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = deque()
+            self._lanes = dict(sorted(self._lanes.items()))
+        return lane
+
+    def _ensure_started(self, loop):
+        """首次提交时启动调度任务"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        """调度循环：取出可发送的消息启动发送，没有时等待到最早可发送的时间"""
+        while not self._stopping:
+            job, client, delay = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                timeout = None if delay == float('inf') else delay
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.ensure_future(self._send(job, client))
+            self._inflight.add(job.future)
+            task.add_done_callback(lambda _, f=job.future: self._finish(f))
+
+    def _dequeued(self, job):
+        """排队中的消息被调用方取消时立即从排队数中扣除，消息对象在调度时再从队列移除"""
+        if job.queued:
+            job.queued = False
+            self._pending -= 1
+            self._check_idle()
+
+    def _finish(self, future):
+        """发送任务结束"""
+        self._inflight.discard(future)
+        self._check_idle()
+
+    def _check_idle(self):
+        """没有排队和发送中的消息时唤醒 drain()"""
+        if not self._pending and not self._inflight and self._idle is not None:
+            self._idle.set()
+
+    def _next_job(self):
+        """
+        按优先级找出第一条账号和聊天都可发送的消息
+
+        各账号的等待时间每次调度只计算一次；没有空闲账号时不扫描队列。
+
+        Returns:
+            (job, client, delay)：没有可发送的消息时 job 为 None，delay 为最早可发送的等待秒数
+        """
+        now = time.monotonic()
+        delays = {client: account.delay(now) for client, account in self._accounts.items()}
+        free = next((client for client, delay in delays.items() if delay <= 0), None)
+        if free is None:
+            # 所有账号都在发送或暂停中，任何消息都无法发送
+            return None, None, min(delays.values())
+        best = float('inf')
+        for lane in self._lanes.values():
+            # 先丢弃队首已被调用方取消的消息
+            while lane and lane[0].future.done():
+                lane.popleft()
+            blocked = set()
+            for index, job in enumerate(lane):
+                if job.chat in blocked or job.future.done():
+                    continue
+                chat = self._chats.get(job.chat)
+                chat_delay = chat.delay(now) if chat is not None else 0.0
+                client = free if job.client is None else job.client
+                delay = max(chat_delay, delays[client])
+                if delay > 0:
+                    # 同一聊天的后续消息也要等待，保证顺序
+                    blocked.add(job.chat)
+                    best = min(best, delay)
+                    continue
+                del lane[index]
+                job.queued = False
+                self._pending -= 1
+                if chat is None:
+                    chat = self._chats[job.chat] = _Lane(self.chat_rate, self.chat_burst)
+                account = self._accounts[client]
+                chat.bucket.take(now)
+                account.bucket.take(now)
+                chat.busy = account.busy = True
+                return job, client, 0.0
+        return None, None, best
+
+    async def _send(self, job, client):
+        """发送一条消息并处理限流"""
+        account = self._accounts[client]
+        chat = self._chats[job.chat]
+        try:
+            result = await client.send_message(job.entity, job.message, **job.kwargs)
+        except errors.SlowModeWaitError as e:
+            self._park(job, chat, e, f"聊天 {job.chat} 慢速模式")
+        except errors.FloodWaitError as e:
+            self._park(job, account, e, f"账号 {getattr(client, 'session_name', client)} 被限流")
+        except Exception as e:
+            self._failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self._sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            account.busy = chat.busy = False
+            self._finished += 1
+            if self._finished % 1000 == 0:
+                self._prune_chats()
+            self._wakeup.set()
+
+    def _park(self, job, lane, error, reason):
+        """暂停账号或聊天，并把消息放回原优先级队首重试"""
+        self._flood_waits += 1
+        seconds = error.seconds
+        lane.parked_until = max(lane.parked_until, time.monotonic() + seconds)
+        job.attempts += 1
+        if seconds > self.max_flood_wait or job.attempts > self.max_retries:
+            self._failed += 1
+            self.logger.warning("%s %s 秒，放弃发送", reason, seconds)
+            if not job.future.done():
+                job.future.set_exception(error)
+            return
+        self.logger.warning("%s %s 秒，消息重新排队", reason, seconds)
+        if job.future.done():
+            # 发送期间已被调用方取消
+            return
+        self._lane(job.priority).appendleft(job)
+        job.queued = True
+        self._pending += 1
+
+    def _prune_chats(self):
+        """清理空闲聊天的限速状态，避免群发大量聊天后内存持续增长"""
+        now = time.monotonic()
+        idle = [
+            key for key, chat in self._chats.items()
+            if not chat.busy and chat.parked_until <= now and chat.bucket.full
+        ]
+        for key in idle:
+            del self._chats[key]
+
+
+def _chat_key(entity):
+    """将目标实体转为聊天键"""
+    if isinstance(entity, str):
+        return entity.lower()
+    if isinstance(entity, int):
+        return entity
+    return getattr(entity, 'id', None) or id(entity)
@@ -0,0 +1,326 @@
+import datetime
+import time
+from telethon import utils
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession
+from telethon.tl.types import PeerChannel, PeerChat, PeerUser
+from telethon.tl.types.updates import State
+from .log import Logger
+
+
+# 实体行 (id, hash, username, phone, entity_name) 中各查询列的位置
+_COLUMNS = {'id': 0, 'username': 2, 'phone': 3, 'entity_name': 4}
+
+
+class DBSession(MemorySession):
+    """
+    保存在 MySQL 中的 Telethon 会话，任何节点都可以加载同一个账号
+
+    授权信息（数据中心和 auth key）变化时立即写入；实体和更新状态先缓存在内存中，
+    累计到 max_dirty 条或距上次写入超过 flush_interval 秒时批量写入，
+    save()、close() 时写入剩余部分。写入失败的数据留在缓冲中，下次写入时重试。
+    同一账号同一时间只应在一个节点上运行。
+
+    内存未命中的实体用一次查询从数据库查找，数据库中也不存在的记入未命中缓存，
+    直到该实体出现在更新中，避免反复查询。
+    """
+
+    def __init__(self, db, name, prefix='tt_session', flush_interval=5.0, max_dirty=500, max_missing=10000,
+                 logger=None):
+        """
+        初始化会话并从数据库加载
+
+        Args:
+            db: DB 对象（Telethon 同步调用会话方法，因此需使用同步的 DB）
+            name: 会话名称（账号标识）
+            prefix: 表名前缀，使用 {prefix}s、{prefix}_entities、{prefix}_states 三张表
+            flush_interval: 实体和更新状态的最长缓冲时间（秒）
+            max_dirty: 缓冲的实体和更新状态达到此数量时立即写入
+            max_missing: 未命中缓存的最大条数，超过时清空
+            logger: 日志记录器，达到阈值自动写入失败时记录警告
+        """
+        super().__init__()
+        self.db = db
+        self.name = name
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.max_missing = max_missing
+        self.logger = logger or Logger()
+        self._by_id = {}
+        self._by_username = {}
+        self._by_phone = {}
+        self._by_name = {}
+        self._missing = set()
+        self._dirty_entities = {}
+        self._dirty_states = {}
+        self._flushed_at = time.monotonic()
+        self._flush_failed = False
+        self._load()
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def create_tables(cls, db, prefix='tt_session'):
+        """
+        创建会话表（已存在时跳过）
+
+        Args:
+            db: DB 对象
+            prefix: 表名前缀
+        """
+        db.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{prefix}s` (
+                `name` VARCHAR(191) NOT NULL PRIMARY KEY,
+                `dc_id` INT NOT NULL,
+                `server_address` VARCHAR(64) NULL,
+                `port` INT NULL,
+                `auth_key` VARBINARY(256) NULL,
+                `takeout_id` BIGINT NULL,
+                `updated_at` DATETIME NOT NULL
+            )
+        """)
+        db.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{prefix}_entities` (
+                `name` VARCHAR(191) NOT NULL,
+                `id` BIGINT NOT NULL,
+                `hash` BIGINT NOT NULL,
+                `username` VARCHAR(64) NULL,
+                `phone` VARCHAR(32) NULL,
+                `entity_name` VARCHAR(255) NULL,
+                PRIMARY KEY (`name`, `id`),
+                KEY `idx_username` (`name`, `username`),
+                KEY `idx_phone` (`name`, `phone`)
+            ) DEFAULT CHARSET=utf8mb4
+        """)
+        db.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{prefix}_states` (
+                `name` VARCHAR(191) NOT NULL,
+                `entity_id` BIGINT NOT NULL,
+                `pts` INT NOT NULL,
+                `qts` INT NOT NULL,
+                `date` BIGINT NOT NULL,
+                `seq` INT NOT NULL,
+                PRIMARY KEY (`name`, `entity_id`)
+            )
+        """)
+
+    @classmethod
+    def list_names(cls, db, prefix='tt_session'):
+        """
+        列出已保存授权信息的会话名称
+
+        Returns:
+            list: 会话名称
+        """
+        rows = db.query(f"SELECT name FROM `{prefix}s` WHERE auth_key IS NOT NULL ORDER BY name", cache_ttl=0)
+        return [row['name'] for row in rows]
+
+    def _load(self):
+        """加载授权信息和更新状态"""
+        row = self.db.query_one(
+            f"SELECT dc_id, server_address, port, auth_key, takeout_id FROM `{self.prefix}s` WHERE name = %s",
+            [self.name],
+            cache_ttl=0,
+        )
+        if row:
+            self._dc_id = row['dc_id']
+            self._server_address = row['server_address']
+            self._port = row['port']
+            self._auth_key = AuthKey(data=bytes(row['auth_key'])) if row['auth_key'] else None
+            self._takeout_id = row['takeout_id']
+        rows = self.db.query(
+            f"SELECT entity_id, pts, qts, date, seq FROM `{self.prefix}_states` WHERE name = %s",
+            [self.name],
+            cache_ttl=0,
+        )
+        for r in rows:
+            date = datetime.datetime.fromtimestamp(r['date'], tz=datetime.timezone.utc)
+            self._update_states[r['entity_id']] = State(r['pts'], r['qts'], date, r['seq'], unread_count=0)
+
+    def _save_auth(self):
+        """立即写入授权信息"""
+        self.db.execute(
+            f"INSERT INTO `{self.prefix}s` (name, dc_id, server_address, port, auth_key, takeout_id, updated_at) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE "
+            f"dc_id = VALUES(dc_id), server_address = VALUES(server_address), port = VALUES(port), "
+            f"auth_key = VALUES(auth_key), takeout_id = VALUES(takeout_id), updated_at = VALUES(updated_at)",
+            [
+                self.name, self._dc_id, self._server_address, self._port,
+                self._auth_key.key if self._auth_key else None, self._takeout_id,
+            ],
+        )
+
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self._save_auth()
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self._save_auth()
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._save_auth()
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty_states[entity_id] = state
+        self._maybe_flush()
+
+    def process_entities(self, tlo):
+        """记录实体到内存索引，按批写入数据库"""
+        for row in self._entities_to_rows(tlo):
+            if self._by_id.get(row[0]) == row:
+                continue
+            self._index(row)
+            self._dirty_entities[row[0]] = row
+        self._maybe_flush()
+
+    def _index(self, row):
+        """将实体行加入内存索引"""
+        entity_id, _, username, phone, entity_name = row
+        self._by_id[entity_id] = row
+        if username:
+            self._by_username[username] = row
+        if phone:
+            self._by_phone[phone] = row
+        if entity_name:
+            self._by_name[entity_name] = row
+        if self._missing:
+            for column, value in (('id', entity_id), ('username', username),
+                                  ('phone', phone), ('entity_name', entity_name)):
+                self._missing.discard((column, value))
+
+    def _lookup(self, column, values):
+        """
+        内存未命中时用一次查询从数据库查找实体并加入内存索引
+
+        Args:
+            column: 查询列
+            values: 候选值，按优先顺序排列
+
+        Returns:
+            第一个候选值对应的实体行，均不存在时返回 None
+        """
+        values = [value for value in values if (column, value) not in self._missing]
+        if not values:
+            return None
+        rows = self.db.query(
+            f"SELECT id, hash, username, phone, entity_name FROM `{self.prefix}_entities` "
+            f"WHERE name = %s AND `{column}` IN ({', '.join(['%s'] * len(values))})",
+            [self.name, *values],
+            cache_ttl=0,
+            row_format='tuple',
+        )
+        position = _COLUMNS[column]
+        found = {}
+        for row in rows:
+            row = tuple(row)
+            # 内存中已有的实体比数据库中的新，不覆盖
+            if row[0] not in self._by_id:
+                self._index(row)
+            found.setdefault(row[position], row)
+        for value in values:
+            if value in found:
+                return found[value]
+        if len(self._missing) + len(values) > self.max_missing:
+            self._missing.clear()
+        self._missing.update((column, value) for value in values)
+        return None
+
+    def get_entity_rows_by_phone(self, phone):
+        row = self._by_phone.get(phone) or self._lookup('phone', [phone])
+        return (row[0], row[1]) if row else None
+
+    def get_entity_rows_by_username(self, username):
+        row = self._by_username.get(username) or self._lookup('username', [username])
+        return (row[0], row[1]) if row else None
+
+    def get_entity_rows_by_name(self, name):
+        row = self._by_name.get(name) or self._lookup('entity_name', [name])
+        return (row[0], row[1]) if row else None
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            ids = (id,)
+        else:
+            ids = (
+                utils.get_peer_id(PeerUser(id)),
+                utils.get_peer_id(PeerChat(id)),
+                utils.get_peer_id(PeerChannel(id)),
+            )
+        for peer_id in ids:
+            row = self._by_id.get(peer_id)
+            if row:
+                return row[0], row[1]
+        row = self._lookup('id', ids)
+        return (row[0], row[1]) if row else None
+
+    def _maybe_flush(self):
+        """缓冲达到数量或时间阈值时写入；在 Telethon 的更新处理中调用，失败时只记录警告"""
+        pending = len(self._dirty_entities) + len(self._dirty_states)
+        if not pending:
+            return
+        elapsed = time.monotonic() - self._flushed_at
+        # 上次写入失败后按 flush_interval 重试，不在每个更新上反复访问数据库
+        if elapsed >= self.flush_interval or (pending >= self.max_dirty and not self._flush_failed):
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.warning("会话 %s 写入实体和更新状态失败，%d 条留待下次写入: %s",
+                                    self.name, len(self._dirty_entities) + len(self._dirty_states), e)
+
+    def flush(self):
+        """
+        将缓冲的实体和更新状态批量写入数据库
+
+        写入失败的部分放回缓冲（期间更新过的条目以新值为准），下次写入时重试
+
+        Raises:
+            数据库写入的异常
+        """
+        self._flushed_at = time.monotonic()
+        if self._dirty_entities:
+            entities, self._dirty_entities = self._dirty_entities, {}
+            try:
+                self.db.bulk_upsert(
+                    f"{self.prefix}_entities", [(self.name, *row) for row in entities.values()],
+                    columns=['name', 'id', 'hash', 'username', 'phone', 'entity_name'],
+                )
+            except Exception:
+                self._dirty_entities = {**entities, **self._dirty_entities}
+                self._flush_failed = True
+                raise
+        if self._dirty_states:
+            states, self._dirty_states = self._dirty_states, {}
+            rows = [
+                (self.name, entity_id, s.pts, s.qts, int(s.date.timestamp()), s.seq)
+                for entity_id, s in states.items()
+            ]
+            try:
+                self.db.bulk_upsert(
+                    f"{self.prefix}_states", rows,
+                    columns=['name', 'entity_id', 'pts', 'qts', 'date', 'seq'],
+                )
+            except Exception:
+                self._dirty_states = {**states, **self._dirty_states}
+                self._flush_failed = True
+                raise
+        self._flush_failed = False
+
+    def save(self):
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+    def delete(self):
+        """删除该会话的所有数据"""
+        self._dirty_entities = {}
+        self._dirty_states = {}
+        for table in (f"{self.prefix}s", f"{self.prefix}_entities", f"{self.prefix}_states"):
+            self.db.delete(f"DELETE FROM `{table}` WHERE name = %s", [self.name])
@@ -0,0 +1,172 @@
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from .log import Logger
+
+
+# 延迟直方图的桶上界（秒）：0.1ms 起按 1.5 倍递增，最后一个桶收纳更慢的调用
+_BOUNDS = tuple(0.0001 * 1.5 ** i for i in range(35))
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r'(?<![\w`$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r'%\(\w+\)s|%s|\?')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES_RE = re.compile(r'\bVALUES\s*\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))*', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """
+    将 SQL 归一化为语句模板：字面量和占位符替换为 ?，IN 列表和多行 VALUES 折叠
+
+    Args:
+        sql: SQL 语句
+
+    Returns:
+        str: 归一化后的语句
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(...)', sql)
+    sql = _VALUES_RE.sub('VALUES (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class _Histogram:
+    """固定桶的延迟直方图"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.counts[bisect_left(_BOUNDS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def percentile(self, p):
+        """按桶上界估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_BOUNDS[i], self.max) if i < len(_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'avg': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+
+class QueryStats:
+    """SQL 执行统计与慢查询日志"""
+
+    # 语句模板数量超过上限后，新模板统一计入此项
+    OTHER = '<other>'
+
+    def __init__(self, slow_threshold=1.0, logger=None, max_statements=1000):
+        """
+        初始化统计
+
+        Args:
+            slow_threshold: 慢查询阈值（秒），超过时写入警告日志；None 表示不记录
+            logger: 日志记录器
+            max_statements: 最多单独统计的语句模板数
+        """
+        self.slow_threshold = slow_threshold
+        self.logger = logger or Logger()
+        self.max_statements = max_statements
+        self._statements = {}
+        self._connects = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed, rows=0, error=False, label=None):
+        """
+        记录一次 SQL 执行
+
+        Args:
+            sql: SQL 语句
+            elapsed: 耗时（秒）
+            rows: 返回或影响的行数
+            error: 是否执行失败
+            label: 已归一化的语句模板，为 None 时根据 sql 生成
+        """
+        key = label or normalize_sql(sql)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    key = self.OTHER
+                    entry = self._statements.get(key)
+                if entry is None:
+                    entry = self._statements[key] = [_Histogram(), 0, 0]
+            entry[0].add(elapsed)
+            entry[1] += rows if rows and rows > 0 else 0
+            if error:
+                entry[2] += 1
+
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            text = sql if len(sql) <= 500 else sql[:500] + '...'
+            self.logger.warning("慢查询 %.1fms，行数 %s: %s", elapsed * 1000, rows, text)
+
+    def record_connect(self, elapsed, kind='connect'):
+        """
+        记录建立连接或 ping 的耗时
+
+        Args:
+            elapsed: 耗时（秒）
+            kind: 'connect' 或 'ping'
+        """
+        with self._lock:
+            hist = self._connects.get(kind)
+            if hist is None:
+                hist = self._connects[kind] = _Histogram()
+            hist.add(elapsed)
+
+    def snapshot(self, top=None):
+        """
+        获取统计快照
+
+        Args:
+            top: 只返回总耗时最高的前 N 条语句，None 返回全部
+
+        Returns:
+            dict: statements 为按总耗时降序的语句列表（含 count、errors、rows、
+                total、avg、p50、p95、p99、max，单位秒），connections 为连接 / ping 耗时
+        """
+        with self._lock:
+            statements = []
+            for sql, (hist, rows, errors) in self._statements.items():
+                item = hist.snapshot()
+                item.update(sql=sql, rows=rows, errors=errors)
+                statements.append(item)
+            connections = {kind: hist.snapshot() for kind, hist in self._connects.items()}
+        statements.sort(key=lambda item: item['total'], reverse=True)
+        if top is not None:
+            statements = statements[:top]
+        return {'statements': statements, 'connections': connections}
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._statements.clear()
+            self._connects.clear()